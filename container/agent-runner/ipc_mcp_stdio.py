@@ -9,13 +9,16 @@ Run by the agent-runner as an MCP server process.
 
 from __future__ import annotations
 
-import json
+import itertools
 import os
 import sys
 import time
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 
+import orjson
+from croniter import croniter
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import TextContent, Tool
@@ -29,18 +32,72 @@ chat_id = os.environ.get("NANOCLAW_CHAT_ID", "")
 group_folder = os.environ.get("NANOCLAW_GROUP_FOLDER", "")
 is_main = os.environ.get("NANOCLAW_IS_MAIN", "0") == "1"
 
+# IPC directories already created by this process (skips a mkdir per event)
+_ready_dirs: set[Path] = set()
+
+# Unique filename suffix: the pid separates concurrent MCP server processes
+# (one per subagent), the counter separates writes within this process
+_PID = os.getpid()
+_file_seq = itertools.count()
+
+_UTC = timezone.utc
+
+
+def _now_iso() -> str:
+    """Current UTC time as an ISO 8601 string (millisecond precision)."""
+    return datetime.now(_UTC).isoformat(timespec="milliseconds")
+
 
 def write_ipc_file(directory: Path, data: dict) -> str:
     """Write an IPC file atomically."""
-    directory.mkdir(parents=True, exist_ok=True)
-    filename = f"{int(time.time() * 1000)}-{os.urandom(4).hex()}.json"
-    filepath = directory / filename
-    temp_path = filepath.with_suffix(".json.tmp")
-    temp_path.write_text(json.dumps(data, indent=2))
-    temp_path.rename(filepath)
+    if directory not in _ready_dirs:
+        directory.mkdir(parents=True, exist_ok=True)
+        _ready_dirs.add(directory)
+    filename = f"{time.time_ns()}-{_PID}-{next(_file_seq)}.json"
+    filepath = os.path.join(directory, filename)
+    temp_path = f"{filepath}.tmp"
+    # One open/write/close on the temp file, then an atomic rename into place
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        os.write(fd, orjson.dumps(data))
+    finally:
+        os.close(fd)
+    os.replace(temp_path, filepath)
     return filename
 
 
+# (st_mtime_ns, st_size, parsed tasks) for the last tasks snapshot read
+_tasks_cache: tuple[int, int, list[dict]] | None = None
+
+
+def _load_tasks_snapshot(tasks_file: Path) -> list[dict] | None:
+    """Read the host's tasks snapshot, reparsing only when the file changes."""
+    global _tasks_cache
+    try:
+        st = tasks_file.stat()
+    except FileNotFoundError:
+        return None
+    if _tasks_cache is not None and _tasks_cache[:2] == (st.st_mtime_ns, st.st_size):
+        return _tasks_cache[2]
+    tasks = orjson.loads(tasks_file.read_bytes())
+    _tasks_cache = (st.st_mtime_ns, st.st_size, tasks)
+    return tasks
+
+
+# Shorthand schedules croniter always accepts; no need to parse them
+_CRON_KEYWORDS = frozenset({"@yearly", "@monthly", "@weekly", "@daily", "@hourly"})
+
+
+@lru_cache(maxsize=256)
+def _is_valid_cron(expr: str) -> bool:
+    """Check a cron expression, caching the verdict per distinct string."""
+    try:
+        croniter(expr)
+        return True
+    except Exception:
+        return False
+
+
 # ──────────────────────────────────────────────────────────────
 # MCP Server
 # ──────────────────────────────────────────────────────────────
@@ -48,127 +105,129 @@ def write_ipc_file(directory: Path, data: dict) -> str:
 app = Server("nanoclaw")
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available MCP tools."""
-    return [
-        Tool(
-            name="send_message",
-            description=(
-                "Send a message to the user or group immediately while you're "
-                "still running. Use this for progress updates or to send "
-                "multiple messages. Note: when running as a scheduled task, "
-                "your final output is NOT sent to the user — use this tool."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "text": {"type": "string", "description": "The message text to send"},
-                    "sender": {
-                        "type": "string",
-                        "description": "Your role/identity name (e.g. 'Researcher')",
-                    },
-                },
-                "required": ["text"],
-            },
+# Tool definitions are constant, so build them once rather than per request
+_TOOLS: list[Tool] = [
+    Tool(
+        name="send_message",
+        description=(
+            "Send a message to the user or group immediately while you're "
+            "still running. Use this for progress updates or to send "
+            "multiple messages. Note: when running as a scheduled task, "
+            "your final output is NOT sent to the user — use this tool."
         ),
-        Tool(
-            name="schedule_task",
-            description=(
-                "Schedule a recurring or one-time task. The task will run as "
-                "a full agent with access to all tools.\n\n"
-                "CONTEXT MODE:\n"
-                "• 'group': runs with chat history\n"
-                "• 'isolated': fresh session (include context in prompt)\n\n"
-                "SCHEDULE VALUE FORMAT (local timezone):\n"
-                "• cron: '0 9 * * *' (daily 9am)\n"
-                "• interval: '300000' (5 minutes in ms)\n"
-                "• once: '2026-02-01T15:30:00' (no Z suffix)"
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "prompt": {"type": "string", "description": "What the agent should do"},
-                    "schedule_type": {
-                        "type": "string",
-                        "enum": ["cron", "interval", "once"],
-                        "description": "Schedule type",
-                    },
-                    "schedule_value": {
-                        "type": "string",
-                        "description": "Schedule value (cron/ms/timestamp)",
-                    },
-                    "context_mode": {
-                        "type": "string",
-                        "enum": ["group", "isolated"],
-                        "default": "group",
-                        "description": "Context mode",
-                    },
-                    "target_group_chat_id": {
-                        "type": "string",
-                        "description": "(Main only) Chat ID of target group",
-                    },
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "text": {"type": "string", "description": "The message text to send"},
+                "sender": {
+                    "type": "string",
+                    "description": "Your role/identity name (e.g. 'Researcher')",
                 },
-                "required": ["prompt", "schedule_type", "schedule_value"],
             },
+            "required": ["text"],
+        },
+    ),
+    Tool(
+        name="schedule_task",
+        description=(
+            "Schedule a recurring or one-time task. The task will run as "
+            "a full agent with access to all tools.\n\n"
+            "CONTEXT MODE:\n"
+            "• 'group': runs with chat history\n"
+            "• 'isolated': fresh session (include context in prompt)\n\n"
+            "SCHEDULE VALUE FORMAT (local timezone):\n"
+            "• cron: '0 9 * * *' (daily 9am)\n"
+            "• interval: '300000' (5 minutes in ms)\n"
+            "• once: '2026-02-01T15:30:00' (no Z suffix)"
         ),
-        Tool(
-            name="list_tasks",
-            description="List all scheduled tasks.",
-            inputSchema={"type": "object", "properties": {}},
-        ),
-        Tool(
-            name="pause_task",
-            description="Pause a scheduled task.",
-            inputSchema={
-                "type": "object",
-                "properties": {"task_id": {"type": "string", "description": "Task ID to pause"}},
-                "required": ["task_id"],
-            },
-        ),
-        Tool(
-            name="resume_task",
-            description="Resume a paused task.",
-            inputSchema={
-                "type": "object",
-                "properties": {"task_id": {"type": "string", "description": "Task ID to resume"}},
-                "required": ["task_id"],
-            },
-        ),
-        Tool(
-            name="cancel_task",
-            description="Cancel and delete a scheduled task.",
-            inputSchema={
-                "type": "object",
-                "properties": {"task_id": {"type": "string", "description": "Task ID to cancel"}},
-                "required": ["task_id"],
-            },
-        ),
-        Tool(
-            name="register_group",
-            description=(
-                "Register a new Telegram group so the agent can respond to "
-                "messages there. Main group only."
-            ),
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "chat_id": {"type": "string", "description": "Telegram chat ID"},
-                    "name": {"type": "string", "description": "Display name"},
-                    "folder": {"type": "string", "description": "Folder name (lowercase, hyphens)"},
-                    "trigger": {"type": "string", "description": "Trigger word (e.g. '@Andy')"},
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "prompt": {"type": "string", "description": "What the agent should do"},
+                "schedule_type": {
+                    "type": "string",
+                    "enum": ["cron", "interval", "once"],
+                    "description": "Schedule type",
+                },
+                "schedule_value": {
+                    "type": "string",
+                    "description": "Schedule value (cron/ms/timestamp)",
+                },
+                "context_mode": {
+                    "type": "string",
+                    "enum": ["group", "isolated"],
+                    "default": "group",
+                    "description": "Context mode",
+                },
+                "target_group_chat_id": {
+                    "type": "string",
+                    "description": "(Main only) Chat ID of target group",
                 },
-                "required": ["chat_id", "name", "folder", "trigger"],
             },
+            "required": ["prompt", "schedule_type", "schedule_value"],
+        },
+    ),
+    Tool(
+        name="list_tasks",
+        description="List all scheduled tasks.",
+        inputSchema={"type": "object", "properties": {}},
+    ),
+    Tool(
+        name="pause_task",
+        description="Pause a scheduled task.",
+        inputSchema={
+            "type": "object",
+            "properties": {"task_id": {"type": "string", "description": "Task ID to pause"}},
+            "required": ["task_id"],
+        },
+    ),
+    Tool(
+        name="resume_task",
+        description="Resume a paused task.",
+        inputSchema={
+            "type": "object",
+            "properties": {"task_id": {"type": "string", "description": "Task ID to resume"}},
+            "required": ["task_id"],
+        },
+    ),
+    Tool(
+        name="cancel_task",
+        description="Cancel and delete a scheduled task.",
+        inputSchema={
+            "type": "object",
+            "properties": {"task_id": {"type": "string", "description": "Task ID to cancel"}},
+            "required": ["task_id"],
+        },
+    ),
+    Tool(
+        name="register_group",
+        description=(
+            "Register a new Telegram group so the agent can respond to "
+            "messages there. Main group only."
         ),
-    ]
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "chat_id": {"type": "string", "description": "Telegram chat ID"},
+                "name": {"type": "string", "description": "Display name"},
+                "folder": {"type": "string", "description": "Folder name (lowercase, hyphens)"},
+                "trigger": {"type": "string", "description": "Trigger word (e.g. '@Andy')"},
+            },
+            "required": ["chat_id", "name", "folder", "trigger"],
+        },
+    ),
+]
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available MCP tools."""
+    return _TOOLS
 
 
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle MCP tool calls."""
-    now = datetime.now(timezone.utc).isoformat()
-
     if name == "send_message":
         data = {
             "type": "message",
@@ -176,7 +235,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             "text": arguments["text"],
             "sender": arguments.get("sender"),
             "groupFolder": group_folder,
-            "timestamp": now,
+            "timestamp": _now_iso(),
         }
         write_ipc_file(MESSAGES_DIR, data)
         return [TextContent(type="text", text="Message sent.")]
@@ -187,10 +246,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         sval = arguments["schedule_value"]
 
         if stype == "cron":
-            try:
-                from croniter import croniter
-                croniter(sval)
-            except Exception:
+            if sval not in _CRON_KEYWORDS and not _is_valid_cron(sval):
                 return [TextContent(
                     type="text",
                     text=f'Invalid cron: "{sval}". Use format like "0 9 * * *".',
@@ -228,7 +284,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             "context_mode": arguments.get("context_mode", "group"),
             "targetChatId": target,
             "createdBy": group_folder,
-            "timestamp": now,
+            "timestamp": _now_iso(),
         }
         filename = write_ipc_file(TASKS_DIR, data)
         return [TextContent(type="text", text=f"Task scheduled ({filename}): {stype} - {sval}")]
@@ -236,10 +292,10 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     elif name == "list_tasks":
         tasks_file = IPC_DIR / "current_tasks.json"
         try:
-            if not tasks_file.exists():
+            all_tasks = _load_tasks_snapshot(tasks_file)
+            if all_tasks is None:
                 return [TextContent(type="text", text="No scheduled tasks found.")]
 
-            all_tasks = json.loads(tasks_file.read_text())
             tasks = all_tasks if is_main else [t for t in all_tasks if t.get("groupFolder") == group_folder]
 
             if not tasks:
@@ -259,7 +315,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             "taskId": arguments["task_id"],
             "groupFolder": group_folder,
             "isMain": is_main,
-            "timestamp": now,
+            "timestamp": _now_iso(),
         }
         write_ipc_file(TASKS_DIR, data)
         return [TextContent(type="text", text=f"Task {arguments['task_id']} pause requested.")]
@@ -270,7 +326,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             "taskId": arguments["task_id"],
             "groupFolder": group_folder,
             "isMain": is_main,
-            "timestamp": now,
+            "timestamp": _now_iso(),
         }
         write_ipc_file(TASKS_DIR, data)
         return [TextContent(type="text", text=f"Task {arguments['task_id']} resume requested.")]
@@ -281,7 +337,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             "taskId": arguments["task_id"],
             "groupFolder": group_folder,
             "isMain": is_main,
-            "timestamp": now,
+            "timestamp": _now_iso(),
         }
         write_ipc_file(TASKS_DIR, data)
         return [TextContent(type="text", text=f"Task {arguments['task_id']} cancellation requested.")]
@@ -296,7 +352,7 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             "name": arguments["name"],
             "folder": arguments["folder"],
             "trigger": arguments["trigger"],
-            "timestamp": now,
+            "timestamp": _now_iso(),
         }
         write_ipc_file(TASKS_DIR, data)
         return [TextContent(
@@ -9,15 +9,23 @@ polls IPC files for follow-up messages.
 from __future__ import annotations
 
 import asyncio
-import json
+import ctypes
 import os
-import re
 import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+import orjson
+
+try:
+    from claude_code_sdk import ClaudeCodeOptions
+    from claude_code_sdk import query as claude_query
+except ImportError:  # reported as a structured error by run_query
+    ClaudeCodeOptions = None
+    claude_query = None
+
 IPC_INPUT_DIR = Path("/workspace/ipc/input")
 IPC_INPUT_CLOSE = IPC_INPUT_DIR / "_close"
 IPC_POLL_SECONDS = 0.5
@@ -25,6 +33,9 @@ IPC_POLL_SECONDS = 0.5
 OUTPUT_START_MARKER = "---NANOCLAW_OUTPUT_START---"
 OUTPUT_END_MARKER = "---NANOCLAW_OUTPUT_END---"
 
+_OUTPUT_START_LINE = f"{OUTPUT_START_MARKER}\n".encode()
+_OUTPUT_END_LINE = f"\n{OUTPUT_END_MARKER}\n".encode()
+
 
 # ──────────────────────────────────────────────────────────────
 # Helpers
@@ -32,15 +43,19 @@ OUTPUT_END_MARKER = "---NANOCLAW_OUTPUT_END---"
 
 
 def log(message: str) -> None:
-    """Write to stderr (stdout is reserved for structured output)."""
-    print(f"[agent-runner] {message}", file=sys.stderr, flush=True)
+    """Write to stderr (stdout is reserved for structured output).
+
+    stderr is write-through, so this is one syscall per line; print()
+    issued separate writes for the text and the newline.
+    """
+    sys.stderr.write(f"[agent-runner] {message}\n")
 
 
 def write_output(output: dict[str, Any]) -> None:
-    """Write a structured output block to stdout."""
-    print(OUTPUT_START_MARKER, flush=True)
-    print(json.dumps(output), flush=True)
-    print(OUTPUT_END_MARKER, flush=True)
+    """Write a structured output block to stdout as a single write."""
+    out = sys.stdout.buffer
+    out.write(_OUTPUT_START_LINE + orjson.dumps(output) + _OUTPUT_END_LINE)
+    out.flush()
 
 
 def should_close() -> bool:
@@ -57,19 +72,24 @@ def should_close() -> bool:
 def drain_ipc_input() -> list[str]:
     """Read and consume all pending IPC input messages."""
     try:
-        IPC_INPUT_DIR.mkdir(parents=True, exist_ok=True)
-        files = sorted(IPC_INPUT_DIR.glob("*.json"))
+        # The directory is created once in main(); skip per-tick mkdir
+        with os.scandir(IPC_INPUT_DIR) as it:
+            entries = sorted(
+                (e for e in it if e.name.endswith(".json") and e.is_file()),
+                key=lambda e: e.name,
+            )
         messages: list[str] = []
-        for f in files:
+        for entry in entries:
             try:
-                data = json.loads(f.read_text())
-                f.unlink()
+                with open(entry.path, "rb") as fh:
+                    data = orjson.loads(fh.read())
+                os.unlink(entry.path)
                 if data.get("type") == "message" and data.get("text"):
                     messages.append(data["text"])
             except Exception as err:
-                log(f"Failed to process input file {f.name}: {err}")
+                log(f"Failed to process input file {entry.name}: {err}")
                 try:
-                    f.unlink()
+                    os.unlink(entry.path)
                 except Exception:
                     pass
         return messages
@@ -78,15 +98,67 @@ def drain_ipc_input() -> list[str]:
         return []
 
 
-async def wait_for_ipc_message() -> str | None:
+class IpcInputWatcher:
+    """Wake up as soon as a file lands in the IPC input directory.
+
+    Uses Linux inotify when available. Bind mounts that don't deliver
+    events (e.g. virtiofs shares from a macOS host) still work: wait()
+    times out after IPC_POLL_SECONDS, matching the old polling cadence.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+
+    def __init__(self) -> None:
+        self._event = asyncio.Event()
+        self._fd: int | None = None
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+            if libc.inotify_add_watch(fd, str(IPC_INPUT_DIR).encode(), mask) < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            asyncio.get_running_loop().add_reader(fd, self._on_readable)
+            self._fd = fd
+        except (OSError, AttributeError) as err:
+            log(f"inotify unavailable, polling IPC input: {err}")
+
+    def _on_readable(self) -> None:
+        try:
+            while os.read(self._fd, 4096):  # type: ignore[arg-type]
+                pass
+        except BlockingIOError:
+            pass
+        self._event.set()
+
+    async def wait(self) -> None:
+        """Block until the directory changes or the poll interval elapses."""
+        try:
+            await asyncio.wait_for(self._event.wait(), IPC_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        self._event.clear()
+
+    def close(self) -> None:
+        if self._fd is not None:
+            asyncio.get_running_loop().remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+
+
+async def wait_for_ipc_message(watcher: IpcInputWatcher) -> str | None:
     """Wait for a new IPC message or _close sentinel."""
     while True:
-        if should_close():
+        # Disk I/O on the shared IPC mount runs off the event loop
+        if await asyncio.to_thread(should_close):
             return None
-        messages = drain_ipc_input()
+        messages = await asyncio.to_thread(drain_ipc_input)
         if messages:
             return "\n".join(messages)
-        await asyncio.sleep(IPC_POLL_SECONDS)
+        await watcher.wait()
 
 
 # ──────────────────────────────────────────────────────────────
@@ -94,8 +166,19 @@ async def wait_for_ipc_message() -> str | None:
 # ──────────────────────────────────────────────────────────────
 
 
+class _SlugTable(dict[int, str]):
+    """str.translate table: keep [a-z0-9], map every other codepoint to "-"."""
+
+    def __missing__(self, codepoint: int) -> str:
+        return "-"
+
+
+_SLUG_TABLE = _SlugTable({ord(c): c for c in "abcdefghijklmnopqrstuvwxyz0123456789"})
+
+
 def _sanitize_filename(summary: str) -> str:
-    return re.sub(r"^-+|-+$", "", re.sub(r"[^a-z0-9]+", "-", summary.lower()))[:50]
+    slug = summary.lower().translate(_SLUG_TABLE)
+    return "-".join(part for part in slug.split("-") if part)[:50]
 
 
 def _format_transcript_markdown(messages: list[dict[str, str]], title: str | None = None) -> str:
@@ -108,33 +191,44 @@ def _format_transcript_markdown(messages: list[dict[str, str]], title: str | Non
         "---",
         "",
     ]
+    append = lines.append
     for msg in messages:
         sender = "User" if msg["role"] == "user" else "Andy"
-        content = msg["content"][:2000] + "..." if len(msg["content"]) > 2000 else msg["content"]
-        lines.append(f"**{sender}**: {content}")
-        lines.append("")
+        content = msg["content"]
+        if len(content) > 2000:
+            content = f"{content[:2000]}..."
+        # Trailing newline stands in for the blank separator line
+        append(f"**{sender}**: {content}\n")
     return "\n".join(lines)
 
 
-def _parse_transcript(content: str) -> list[dict[str, str]]:
+def _parse_transcript(transcript_path: str) -> list[dict[str, str]]:
+    """Parse a JSONL session transcript line by line, without loading it whole."""
     messages: list[dict[str, str]] = []
-    for line in content.split("\n"):
-        if not line.strip():
-            continue
-        try:
-            entry = json.loads(line)
-            if entry.get("type") == "user" and entry.get("message", {}).get("content"):
-                mc = entry["message"]["content"]
-                text = mc if isinstance(mc, str) else "".join(c.get("text", "") for c in mc)
-                if text:
-                    messages.append({"role": "user", "content": text})
-            elif entry.get("type") == "assistant" and entry.get("message", {}).get("content"):
-                parts = [c["text"] for c in entry["message"]["content"] if c.get("type") == "text"]
-                text = "".join(parts)
+    append = messages.append
+    with open(transcript_path, encoding="utf-8", buffering=1 << 20) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = orjson.loads(line)
+                role = entry.get("type")
+                if role != "user" and role != "assistant":
+                    continue
+                content = entry.get("message", {}).get("content")
+                if not content:
+                    continue
+                if role == "user":
+                    if isinstance(content, str):
+                        text = content
+                    else:
+                        text = "".join(c.get("text", "") for c in content)
+                else:
+                    text = "".join(c["text"] for c in content if c.get("type") == "text")
                 if text:
-                    messages.append({"role": "assistant", "content": text})
-        except (json.JSONDecodeError, KeyError, TypeError):
-            pass
+                    append({"role": role, "content": text})
+            except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+                pass
     return messages
 
 
@@ -144,8 +238,12 @@ def _get_session_summary(session_id: str, transcript_path: str) -> str | None:
     if not os.path.exists(index_path):
         return None
     try:
-        with open(index_path) as f:
-            index = json.load(f)
+        with open(index_path, "rb") as f:
+            raw = f.read()
+        # Most sessions have no summary yet; skip the parse when the id is absent
+        if session_id.encode() not in raw:
+            return None
+        index = orjson.loads(raw)
         for entry in index.get("entries", []):
             if entry.get("sessionId") == session_id and entry.get("summary"):
                 return entry["summary"]
@@ -164,13 +262,15 @@ async def run_query(
     session_id: str | None,
     mcp_server_path: str,
     container_input: dict[str, Any],
+    watcher: IpcInputWatcher,
     resume_at: str | None = None,
 ) -> dict[str, Any]:
     """Run a single Claude SDK query and stream results.
 
     Uses the claude-code-sdk Python package.
     """
-    from claude_code_sdk import query as claude_query, ClaudeCodeOptions
+    if claude_query is None or ClaudeCodeOptions is None:
+        raise RuntimeError("claude-code-sdk is not installed")
 
     # Load global CLAUDE.md
     global_claude_md: str | None = None
@@ -216,21 +316,20 @@ async def run_query(
     result_count = 0
     closed_during_query = False
 
-    # IPC polling task
+    # Close-sentinel watch task
     ipc_polling = True
 
     async def poll_ipc() -> None:
         nonlocal closed_during_query, ipc_polling
         while ipc_polling:
-            if should_close():
+            if await asyncio.to_thread(should_close):
                 log("Close sentinel detected during query")
                 closed_during_query = True
                 ipc_polling = False
                 return
-            # Drain and discard during active query
-            # (follow-up messages will be piped by the main loop)
-            drain_ipc_input()
-            await asyncio.sleep(IPC_POLL_SECONDS)
+            # Follow-up messages stay on disk until the query ends;
+            # wait_for_ipc_message picks them up for the next query
+            await watcher.wait()
 
     poll_task = asyncio.create_task(poll_ipc())
 
@@ -291,8 +390,7 @@ async def run_query(
 async def main() -> None:
     # Read input from stdin
     try:
-        stdin_data = sys.stdin.read()
-        container_input = json.loads(stdin_data)
+        container_input = orjson.loads(sys.stdin.buffer.read())
         log(f"Received input for group: {container_input.get('groupFolder', 'unknown')}")
     except Exception as err:
         write_output({
@@ -327,11 +425,14 @@ async def main() -> None:
 
     # Query loop
     resume_at: str | None = None
+    watcher = IpcInputWatcher()
     try:
         while True:
             log(f"Starting query (session: {session_id or 'new'}, resumeAt: {resume_at or 'latest'})...")
 
-            result = await run_query(prompt, session_id, mcp_server_path, container_input, resume_at)
+            result = await run_query(
+                prompt, session_id, mcp_server_path, container_input, watcher, resume_at
+            )
 
             if result.get("newSessionId"):
                 session_id = result["newSessionId"]
@@ -346,7 +447,7 @@ async def main() -> None:
             write_output({"status": "success", "result": None, "newSessionId": session_id})
 
             log("Query ended, waiting for next IPC message...")
-            next_message = await wait_for_ipc_message()
+            next_message = await wait_for_ipc_message(watcher)
             if next_message is None:
                 log("Close sentinel received, exiting")
                 break
@@ -363,6 +464,8 @@ async def main() -> None:
             "error": str(err),
         })
         sys.exit(1)
+    finally:
+        watcher.close()
 
 
 if __name__ == "__main__":
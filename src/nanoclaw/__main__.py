@@ -9,19 +9,23 @@ Run with: python -m nanoclaw
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import importlib.util
 import json
-import re
 import signal
 import sys
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable
 
 from .channels.telegram import TelegramChannel
 from .config import (
     ASSISTANT_NAME,
     DATA_DIR,
     IDLE_TIMEOUT,
+    INTERNAL_TAG_RE,
     MAIN_GROUP_FOLDER,
     POLL_INTERVAL,
-    TRIGGER_PATTERN,
 )
 from .container_runner import (
     ContainerOutput,
@@ -34,21 +38,24 @@ from .db import (
     get_all_chats,
     get_all_registered_groups,
     get_all_sessions,
-    get_all_tasks,
     get_messages_since,
     get_new_messages,
     get_router_state,
+    get_task_snapshot,
     init_database,
+    run_write,
     set_registered_group,
-    set_router_state,
+    set_router_states,
     set_session,
-    store_chat_metadata,
-    store_message,
+    store_chats_metadata,
+    store_messages,
+    submit_write,
+    wait_for_writes,
 )
 from .group_queue import GroupQueue
 from .ipc import start_ipc_watcher, stop_ipc_watcher, IpcDeps
 from .logger import logger
-from .router import format_messages, format_outbound
+from .router import format_messages, format_outbound, has_trigger
 from .task_scheduler import start_scheduler_loop, stop_scheduler, SchedulerDeps
 from .types import (
     AvailableGroup,
@@ -66,11 +73,29 @@ _last_timestamp: str = ""
 _sessions: dict[str, str] = {}
 _registered_groups: dict[str, RegisteredGroup] = {}
 _last_agent_timestamp: dict[str, str] = {}
+_agent_ts_dirty: bool = False
+_available_groups_cache: list[AvailableGroup] | None = None
 _message_loop_running: bool = False
+_wakeup: asyncio.Event = asyncio.Event()
+
+# Inbound Telegram records (messages, or (chat_id, timestamp) activity) are
+# persisted in batches by _ingest_writer rather than inside the update handler.
+_INGEST_QUEUE_SIZE: int = 1000
+_INGEST_BATCH_SIZE: int = 100
+_ingest_queue: asyncio.Queue[NewMessage | tuple[str, str]] = asyncio.Queue(
+    maxsize=_INGEST_QUEUE_SIZE
+)
+_ingest_task: asyncio.Task[None] | None = None
 
 _telegram: TelegramChannel | None = None
+_IDLE_TIMEOUT_S: float = IDLE_TIMEOUT / 1000
+_SAVE_DELAY_S: float = 0.05
+_save_handle: asyncio.TimerHandle | None = None
 _queue: GroupQueue = GroupQueue()
 
+# uvloop is unavailable on some platforms; main_entry falls back to the stdlib loop
+_HAS_UVLOOP: bool = importlib.util.find_spec("uvloop") is not None
+
 
 # ──────────────────────────────────────────────────────────────
 # State persistence
@@ -94,9 +119,56 @@ def _load_state() -> None:
     logger.info("State loaded", group_count=len(_registered_groups))
 
 
-def _save_state() -> None:
-    set_router_state("last_timestamp", _last_timestamp)
-    set_router_state("last_agent_timestamp", json.dumps(_last_agent_timestamp))
+def _set_agent_ts(chat_id: str, timestamp: str) -> None:
+    """Move a group's agent cursor, marking it for the next state save."""
+    global _agent_ts_dirty
+    if _last_agent_timestamp.get(chat_id) != timestamp:
+        _last_agent_timestamp[chat_id] = timestamp
+        _agent_ts_dirty = True
+
+
+def _state_snapshot() -> dict[str, str]:
+    """Serialize the router state that needs saving, clearing the dirty flag."""
+    global _agent_ts_dirty
+    state = {"last_timestamp": _last_timestamp}
+    if _agent_ts_dirty:
+        state["last_agent_timestamp"] = json.dumps(
+            _last_agent_timestamp, separators=(",", ":")
+        )
+        _agent_ts_dirty = False
+    return state
+
+
+def _write_in_background(fn: Callable[..., None], *args: Any) -> None:
+    """Queue a DB write on the writer thread, logging (not raising) failures."""
+
+    def _done(future: Future[None]) -> None:
+        if future.exception() is not None:
+            logger.error(
+                "Background DB write failed",
+                operation=fn.__name__,
+                error=str(future.exception()),
+            )
+
+    submit_write(fn, *args).add_done_callback(_done)
+
+
+def _schedule_save() -> None:
+    """Persist state shortly, coalescing bursts of cursor updates into one write."""
+    global _save_handle
+    if _save_handle is None:
+        _save_handle = asyncio.get_running_loop().call_later(
+            _SAVE_DELAY_S, _flush_state
+        )
+
+
+def _flush_state() -> None:
+    """Queue any pending state for writing now, cancelling a scheduled save."""
+    global _save_handle
+    if _save_handle is not None:
+        _save_handle.cancel()
+        _save_handle = None
+    _write_in_background(set_router_states, _state_snapshot())
 
 
 # ──────────────────────────────────────────────────────────────
@@ -105,7 +177,9 @@ def _save_state() -> None:
 
 
 def _register_group(chat_id: str, group: RegisteredGroup) -> None:
+    global _available_groups_cache
     _registered_groups[chat_id] = group
+    _available_groups_cache = None
     set_registered_group(chat_id, group)
 
     group_dir = DATA_DIR.parent / "groups" / group.folder
@@ -115,20 +189,35 @@ def _register_group(chat_id: str, group: RegisteredGroup) -> None:
 
 
 def _get_available_groups() -> list[AvailableGroup]:
-    """Get available groups list for the agent, ordered by most recent activity."""
-    chats = get_all_chats()
-    registered_ids = set(_registered_groups.keys())
-
-    return [
-        AvailableGroup(
-            chat_id=c["id"],
-            name=c["name"],
-            last_activity=c.get("last_message_time", ""),
-            is_registered=c["id"] in registered_ids,
+    """Get available groups list for the agent, ordered by most recent activity.
+
+    The result is cached until chat metadata changes or a group is
+    registered; callers must treat the returned list as read-only.
+    """
+    global _available_groups_cache
+    if _available_groups_cache is not None:
+        return _available_groups_cache
+
+    registered_ids = frozenset(_registered_groups)
+    # Rows come straight from SQLite with known types, so skip validation.
+    construct = AvailableGroup.model_construct
+    groups: list[AvailableGroup] = []
+    append = groups.append
+    for c in get_all_chats():
+        cid = c.chat_id
+        if cid == "__group_sync__":
+            continue
+        append(
+            construct(
+                chat_id=cid,
+                name=c.name,
+                last_activity=c.last_message_time or "",
+                is_registered=cid in registered_ids,
+            )
         )
-        for c in chats
-        if c["id"] != "__group_sync__"
-    ]
+
+    _available_groups_cache = groups
+    return groups
 
 
 # ──────────────────────────────────────────────────────────────
@@ -149,41 +238,38 @@ async def _process_group_messages(chat_id: str) -> bool:
         return True
 
     is_main = group.folder == MAIN_GROUP_FOLDER
-    since = _last_agent_timestamp.get(chat_id, "")
-    missed = get_messages_since(chat_id, since, ASSISTANT_NAME)
+    try:
+        since = _last_agent_timestamp[chat_id]
+    except KeyError:
+        since = ""
+    missed = get_messages_since(chat_id, since)
 
     if not missed:
         return True
 
     # Trigger check for non-main groups
     if not is_main and group.requires_trigger is not False:
-        has_trigger = any(
-            TRIGGER_PATTERN.search(m.content.strip()) for m in missed
-        )
-        if not has_trigger:
+        if not has_trigger(missed):
             return True
 
     prompt = format_messages(missed)
 
     # Advance cursor, save old for rollback
-    previous_cursor = _last_agent_timestamp.get(chat_id, "")
-    _last_agent_timestamp[chat_id] = missed[-1].timestamp
-    _save_state()
+    previous_cursor = since
+    _set_agent_ts(chat_id, missed[-1].timestamp)
+    _schedule_save()
 
     logger.info("Processing messages", group=group.name, message_count=len(missed))
 
     # Idle timer
+    loop = asyncio.get_running_loop()
     idle_handle: asyncio.TimerHandle | None = None
 
     def reset_idle() -> None:
         nonlocal idle_handle
         if idle_handle:
             idle_handle.cancel()
-        loop = asyncio.get_running_loop()
-        idle_handle = loop.call_later(
-            IDLE_TIMEOUT / 1000,
-            lambda: _queue.close_stdin(chat_id),
-        )
+        idle_handle = loop.call_later(_IDLE_TIMEOUT_S, _queue.close_stdin, chat_id)
 
     if _telegram:
         await _telegram.set_typing(chat_id, True)
@@ -194,8 +280,9 @@ async def _process_group_messages(chat_id: str) -> bool:
     async def on_output(result: ContainerOutput) -> None:
         nonlocal had_error, output_sent
         if result.result:
-            raw = result.result if isinstance(result.result, str) else json.dumps(result.result)
-            text = re.sub(r"<internal>[\s\S]*?</internal>", "", raw).strip()
+            raw = result.result
+            text = INTERNAL_TAG_RE.sub("", raw) if "<internal>" in raw else raw
+            text = text.strip()
             logger.info("Agent output", group=group.name, preview=raw[:200])
             if text and _telegram:
                 await _telegram.send_message(chat_id, f"{ASSISTANT_NAME}: {text}")
@@ -218,8 +305,8 @@ async def _process_group_messages(chat_id: str) -> bool:
                 group=group.name,
             )
             return True
-        _last_agent_timestamp[chat_id] = previous_cursor
-        _save_state()
+        _set_agent_ts(chat_id, previous_cursor)
+        _schedule_save()
         logger.warning("Agent error, rolled back cursor for retry", group=group.name)
         return False
 
@@ -236,25 +323,15 @@ async def _run_agent(
     is_main = group.folder == MAIN_GROUP_FOLDER
     session_id = _sessions.get(group.folder)
 
-    # Snapshots
-    tasks = get_all_tasks()
-    write_tasks_snapshot(
+    # Snapshots (written off the loop; each write fsyncs)
+    await asyncio.to_thread(
+        write_tasks_snapshot,
         group.folder,
         is_main,
-        [
-            {
-                "id": t.id,
-                "groupFolder": t.group_folder,
-                "prompt": t.prompt,
-                "schedule_type": t.schedule_type,
-                "schedule_value": t.schedule_value,
-                "status": t.status,
-                "next_run": t.next_run,
-            }
-            for t in tasks
-        ],
+        get_task_snapshot(),
     )
-    write_groups_snapshot(
+    await asyncio.to_thread(
+        write_groups_snapshot,
         group.folder,
         is_main,
         _get_available_groups(),
@@ -265,7 +342,7 @@ async def _run_agent(
     async def wrapped(output: ContainerOutput) -> None:
         if output.new_session_id:
             _sessions[group.folder] = output.new_session_id
-            set_session(group.folder, output.new_session_id)
+            _write_in_background(set_session, group.folder, output.new_session_id)
         if on_output:
             await on_output(output)
 
@@ -285,7 +362,7 @@ async def _run_agent(
 
         if output.new_session_id:
             _sessions[group.folder] = output.new_session_id
-            set_session(group.folder, output.new_session_id)
+            _write_in_background(set_session, group.folder, output.new_session_id)
 
         if output.status == "error":
             logger.error("Container agent error", group=group.name, error=output.error)
@@ -302,6 +379,50 @@ async def _run_agent(
 # ──────────────────────────────────────────────────────────────
 
 
+async def _dispatch_group(
+    cid: str,
+    group_msgs: list[NewMessage],
+    fetched_since: str,
+) -> None:
+    """Pipe a group's new messages to its container or queue a check.
+
+    Advances the agent cursor in memory; the caller persists state.
+    """
+    group = _registered_groups.get(cid)
+    if not group:
+        return
+
+    is_main = group.folder == MAIN_GROUP_FOLDER
+    needs_trigger = not is_main and group.requires_trigger is not False
+
+    if needs_trigger and not has_trigger(group_msgs):
+        return
+
+    # Pull all pending messages since last agent timestamp.
+    # When the agent cursor is not behind the window we just
+    # fetched, group_msgs already holds every pending message.
+    try:
+        agent_since = _last_agent_timestamp[cid]
+    except KeyError:
+        agent_since = ""
+    if agent_since >= fetched_since:
+        all_pending = [m for m in group_msgs if m.timestamp > agent_since]
+    else:
+        all_pending = get_messages_since(cid, agent_since)
+    to_send = all_pending if all_pending else group_msgs
+    formatted = format_messages(to_send)
+
+    if await _queue.send_message(cid, formatted):
+        logger.debug(
+            "Piped messages to active container",
+            chat_id=cid,
+            count=len(to_send),
+        )
+        _set_agent_ts(cid, to_send[-1].timestamp)
+    else:
+        _queue.enqueue_message_check(cid)
+
+
 async def _start_message_loop() -> None:
     """Poll for new messages and dispatch to groups."""
     global _message_loop_running, _last_timestamp
@@ -316,59 +437,111 @@ async def _start_message_loop() -> None:
     while _message_loop_running:
         try:
             chat_ids = list(_registered_groups.keys())
-            messages, new_timestamp = get_new_messages(
-                chat_ids, _last_timestamp, ASSISTANT_NAME
-            )
+            messages, new_timestamp = get_new_messages(chat_ids, _last_timestamp)
 
             if messages:
                 logger.info("New messages", count=len(messages))
+                fetched_since = _last_timestamp
                 _last_timestamp = new_timestamp
-                _save_state()
 
                 # Group by chat_id
-                by_group: dict[str, list[NewMessage]] = {}
+                by_group: defaultdict[str, list[NewMessage]] = defaultdict(list)
                 for msg in messages:
-                    by_group.setdefault(msg.chat_id, []).append(msg)
-
-                for cid, group_msgs in by_group.items():
-                    group = _registered_groups.get(cid)
-                    if not group:
-                        continue
-
-                    is_main = group.folder == MAIN_GROUP_FOLDER
-                    needs_trigger = not is_main and group.requires_trigger is not False
-
-                    if needs_trigger:
-                        has_trigger = any(
-                            TRIGGER_PATTERN.search(m.content.strip())
-                            for m in group_msgs
-                        )
-                        if not has_trigger:
-                            continue
-
-                    # Pull all pending messages since last agent timestamp
-                    all_pending = get_messages_since(
-                        cid,
-                        _last_agent_timestamp.get(cid, ""),
-                        ASSISTANT_NAME,
-                    )
-                    to_send = all_pending if all_pending else group_msgs
-                    formatted = format_messages(to_send)
-
-                    if _queue.send_message(cid, formatted):
-                        logger.debug(
-                            "Piped messages to active container",
-                            chat_id=cid,
-                            count=len(to_send),
-                        )
-                        _last_agent_timestamp[cid] = to_send[-1].timestamp
-                        _save_state()
-                    else:
-                        _queue.enqueue_message_check(cid)
+                    by_group[msg.chat_id].append(msg)
+
+                # Groups are dispatched concurrently (piping a message is a
+                # threaded file write) and state is persisted once for the
+                # whole batch.
+                try:
+                    await asyncio.gather(*(
+                        _dispatch_group(cid, group_msgs, fetched_since)
+                        for cid, group_msgs in by_group.items()
+                    ))
+                finally:
+                    _schedule_save()
         except Exception as err:
             logger.error("Error in message loop", error=str(err))
 
-        await asyncio.sleep(POLL_INTERVAL / 1000)
+        # Sleep until the Telegram handler signals new traffic; the timeout
+        # keeps a polling fallback for messages inserted by other writers.
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+
+
+# ──────────────────────────────────────────────────────────────
+# Channel callbacks
+# ──────────────────────────────────────────────────────────────
+
+
+async def _on_inbound_message(chat_id: str, msg: NewMessage) -> None:
+    await _ingest_queue.put(msg)
+
+
+async def _on_chat_metadata(chat_id: str, timestamp: str) -> None:
+    await _ingest_queue.put((chat_id, timestamp))
+
+
+def _store_inbound(chats: list[tuple[str, str]], msgs: list[NewMessage]) -> None:
+    # Chats first, matching the order the Telegram handler emits them
+    store_chats_metadata(chats)
+    store_messages(msgs)
+
+
+async def _persist_ingest(batch: list[NewMessage | tuple[str, str]]) -> None:
+    """Write a batch of inbound records and notify interested subsystems."""
+    global _available_groups_cache
+    chats: list[tuple[str, str]] = []
+    msgs: list[NewMessage] = []
+    for item in batch:
+        if isinstance(item, tuple):
+            chats.append(item)
+        else:
+            msgs.append(item)
+
+    try:
+        # Shielded so cancelling _ingest_writer on shutdown can't drop a batch
+        # already taken off the queue while the writer thread is busy
+        await asyncio.shield(run_write(_store_inbound, chats, msgs))
+    except Exception as err:
+        logger.error("Failed to store inbound messages", count=len(batch), error=str(err))
+        return
+
+    if chats:
+        _available_groups_cache = None
+    if msgs:
+        _wakeup.set()
+
+
+def _take_ingest_batch(batch: list[NewMessage | tuple[str, str]]) -> None:
+    """Move queued records into *batch* without waiting, up to the batch size."""
+    while len(batch) < _INGEST_BATCH_SIZE:
+        try:
+            batch.append(_ingest_queue.get_nowait())
+        except asyncio.QueueEmpty:
+            return
+
+
+async def _ingest_writer() -> None:
+    """Drain the ingest queue, storing each burst with one write per table."""
+    while True:
+        batch = [await _ingest_queue.get()]
+        _take_ingest_batch(batch)
+        await _persist_ingest(batch)
+
+
+async def _flush_ingest() -> None:
+    """Stop _ingest_writer and persist everything still queued (on shutdown)."""
+    if _ingest_task:
+        _ingest_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _ingest_task
+    while not _ingest_queue.empty():
+        batch: list[NewMessage | tuple[str, str]] = []
+        _take_ingest_batch(batch)
+        await _persist_ingest(batch)
 
 
 # ──────────────────────────────────────────────────────────────
@@ -380,7 +553,7 @@ def _recover_pending_messages() -> None:
     """Startup recovery: enqueue unprocessed messages from registered groups."""
     for chat_id, group in _registered_groups.items():
         since = _last_agent_timestamp.get(chat_id, "")
-        pending = get_messages_since(chat_id, since, ASSISTANT_NAME)
+        pending = get_messages_since(chat_id, since)
         if pending:
             logger.info(
                 "Recovery: found unprocessed messages",
@@ -408,8 +581,8 @@ class _IpcDepsAdapter:
     def register_group(self, chat_id: str, group: RegisteredGroup) -> None:
         _register_group(chat_id, group)
 
-    async def sync_group_metadata(self, force: bool) -> None:
-        pass  # Telegram doesn't need periodic group sync
+    def sync_group_metadata(self, force: bool) -> None:
+        return None  # Telegram doesn't need periodic group sync
 
     def get_available_groups(self) -> list[AvailableGroup]:
         return _get_available_groups()
@@ -459,7 +632,7 @@ class _SchedulerDepsAdapter:
 
 async def main() -> None:
     """Main orchestrator entry point."""
-    global _telegram
+    global _telegram, _ingest_task
 
     # Check container system
     if not await ensure_container_system_running():
@@ -490,6 +663,9 @@ async def main() -> None:
         await _queue.shutdown()
         if _telegram:
             await _telegram.disconnect()
+        await _flush_ingest()
+        _flush_state()
+        await wait_for_writes()
         loop.stop()
 
     for sig in (signal.SIGTERM, signal.SIGINT):
@@ -498,10 +674,11 @@ async def main() -> None:
             lambda s=sig: asyncio.create_task(shutdown(s.name)),
         )
 
-    # Create Telegram channel
+    # Create Telegram channel; inbound records are written by _ingest_writer
+    _ingest_task = asyncio.create_task(_ingest_writer())
     _telegram = TelegramChannel(
-        on_message=lambda chat_id, msg: store_message(msg),
-        on_metadata=lambda chat_id, ts: store_chat_metadata(chat_id, ts),
+        on_message=_on_inbound_message,
+        on_metadata=_on_chat_metadata,
     )
 
     await _telegram.connect()
@@ -514,8 +691,18 @@ async def main() -> None:
     await _start_message_loop()
 
 
-if __name__ == "__main__":
+def main_entry() -> None:
+    """Console-script entry point: run main() on uvloop when available."""
     try:
-        asyncio.run(main())
+        if _HAS_UVLOOP:
+            import uvloop
+
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         pass
+
+
+if __name__ == "__main__":
+    main_entry()
@@ -14,9 +14,11 @@ Key differences from WhatsApp:
 from __future__ import annotations
 
 import asyncio
+from datetime import datetime, timedelta
 from typing import Callable, Awaitable
 
 from telegram import Update
+from telegram.error import RetryAfter
 from telegram.ext import (
     Application,
     ContextTypes,
@@ -24,7 +26,7 @@ from telegram.ext import (
     filters,
 )
 
-from ..config import ASSISTANT_NAME, TELEGRAM_BOT_TOKEN
+from ..config import ASSISTANT_NAME, TELEGRAM_BOT_TOKEN, TELEGRAM_POLL_TIMEOUT
 from ..logger import logger
 from ..types import NewMessage
 
@@ -53,6 +55,10 @@ class TelegramChannel:
         self._connected: bool = False
         self._bot_id: int | None = None
         self._bot_username: str | None = None
+        # One-slot isoformat cache: Telegram dates have 1 s resolution, so
+        # bursts of updates usually share the same timestamp.
+        self._last_date: datetime | None = None
+        self._last_date_iso: str = ""
 
     async def connect(self) -> None:
         """Connect to Telegram and start polling for updates."""
@@ -89,7 +95,11 @@ class TelegramChannel:
 
         # Start polling in the background
         await self._app.start()
-        await self._app.updater.start_polling(drop_pending_updates=True)  # type: ignore[union-attr]
+        # Long-poll getUpdates so an idle bot makes one request per 30 s
+        await self._app.updater.start_polling(  # type: ignore[union-attr]
+            drop_pending_updates=True,
+            timeout=TELEGRAM_POLL_TIMEOUT,
+        )
         self._connected = True
 
     async def disconnect(self) -> None:
@@ -113,25 +123,36 @@ class TelegramChannel:
             return
 
         try:
+            target = int(chat_id)
             # Split long messages (Telegram limit is 4096 chars)
             max_len = 4096
             if len(text) <= max_len:
-                await self._app.bot.send_message(
-                    chat_id=int(chat_id),
-                    text=text,
-                )
+                await self._send_text(target, text)
             else:
-                # Split at line boundaries when possible
-                chunks = _split_message(text, max_len)
-                for chunk in chunks:
-                    await self._app.bot.send_message(
-                        chat_id=int(chat_id),
-                        text=chunk,
-                    )
-                    await asyncio.sleep(0.1)  # Brief delay between chunks
+                # Split at line boundaries when possible. Chunks are sent one
+                # at a time on purpose: concurrent sends may arrive out of order.
+                send = self._send_text
+                for chunk in _split_message(text, max_len):
+                    await send(target, chunk)
         except Exception as err:
             logger.error("Failed to send message", chat_id=chat_id, error=str(err))
 
+    async def _send_text(self, chat_id: int, text: str) -> None:
+        """Send one message, waiting out Telegram flood control once if hit."""
+        assert self._app is not None
+        try:
+            await self._app.bot.send_message(chat_id=chat_id, text=text)
+        except RetryAfter as err:
+            retry_after = err.retry_after
+            delay: float = (
+                retry_after.total_seconds()
+                if isinstance(retry_after, timedelta)
+                else float(retry_after)
+            )
+            logger.warning("Telegram flood control, retrying", chat_id=chat_id, delay=delay)
+            await asyncio.sleep(delay)
+            await self._app.bot.send_message(chat_id=chat_id, text=text)
+
     async def set_typing(self, chat_id: str, is_typing: bool) -> None:
         """Send or clear a typing indicator."""
         if self._app is None or not self._connected or not is_typing:
@@ -168,7 +189,7 @@ class TelegramChannel:
             is_from_me = False
 
         # Build timestamp
-        timestamp = msg.date.isoformat() if msg.date else ""
+        timestamp = self._format_date(msg.date) if msg.date else ""
 
         # Record chat metadata for group discovery
         chat_name = msg.chat.title or msg.chat.full_name or chat_id
@@ -187,6 +208,13 @@ class TelegramChannel:
 
         await self._on_message(chat_id, new_msg)
 
+    def _format_date(self, date: datetime) -> str:
+        """Return date.isoformat(), reusing the previous result for equal dates."""
+        if date != self._last_date:
+            self._last_date = date
+            self._last_date_iso = date.isoformat()
+        return self._last_date_iso
+
     async def get_chat_name(self, chat_id: str) -> str | None:
         """Fetch the display name for a chat from Telegram."""
         if self._app is None:
@@ -199,16 +227,24 @@ class TelegramChannel:
 
 
 def _split_message(text: str, max_len: int) -> list[str]:
-    """Split a long message into chunks, preferring line boundaries."""
+    """Split a long message into chunks, preferring line boundaries.
+
+    Walks a start index instead of re-slicing the remaining tail, so each
+    character is copied once.
+    """
     chunks: list[str] = []
-    while len(text) > max_len:
+    start = 0
+    n = len(text)
+    while n - start > max_len:
         # Find the last newline within the limit
-        split_at = text.rfind("\n", 0, max_len)
-        if split_at == -1 or split_at < max_len // 2:
+        split_at = text.rfind("\n", start, start + max_len)
+        if split_at == -1 or split_at - start < max_len // 2:
             # No good newline, split at max_len
-            split_at = max_len
-        chunks.append(text[:split_at])
-        text = text[split_at:].lstrip("\n")
-    if text:
-        chunks.append(text)
+            split_at = start + max_len
+        chunks.append(text[start:split_at])
+        start = split_at
+        while start < n and text[start] == "\n":
+            start += 1
+    if start < n:
+        chunks.append(text[start:])
     return chunks
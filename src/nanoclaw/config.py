@@ -11,9 +11,14 @@ ASSISTANT_NAME: str = os.environ.get("ASSISTANT_NAME", "Andy")
 
 # Polling intervals (seconds)
 POLL_INTERVAL: float = 2.0
-SCHEDULER_POLL_INTERVAL: float = 60.0
+# Longest the scheduler sleeps; it also wakes when the next task is due
+# and whenever a task is created or changed
+SCHEDULER_POLL_INTERVAL: float = 900.0
 IPC_POLL_INTERVAL: float = 1.0
 
+# Group IPC directories drained concurrently per pass
+IPC_MAX_PARALLEL: int = 8
+
 # Paths
 PROJECT_ROOT: Path = Path.cwd()
 HOME_DIR: Path = Path(os.environ.get("HOME", "/home/user"))
@@ -38,8 +43,29 @@ MAX_CONCURRENT_CONTAINERS: int = max(
     1, int(os.environ.get("MAX_CONCURRENT_CONTAINERS", "5") or "5")
 )
 
+
+def _parse_group_weights(raw: str) -> dict[str, float]:
+    """Parse "chat_id=weight,..." into a dict, skipping malformed entries."""
+    weights: dict[str, float] = {}
+    for item in raw.split(","):
+        chat_id, sep, value = item.strip().partition("=")
+        try:
+            weight = float(value)
+        except ValueError:
+            continue
+        if sep and chat_id and weight > 0:
+            weights[chat_id] = weight
+    return weights
+
+
+# Fair-share weights for groups waiting on a container slot, e.g.
+# GROUP_WEIGHTS="-100123=2,-100456=0.5"; unlisted groups weigh 1.0
+GROUP_WEIGHTS: dict[str, float] = _parse_group_weights(os.environ.get("GROUP_WEIGHTS", ""))
+
 # Telegram bot token
 TELEGRAM_BOT_TOKEN: str = os.environ.get("TELEGRAM_BOT_TOKEN", "")
+# getUpdates long-poll timeout (seconds); Telegram allows up to 50
+TELEGRAM_POLL_TIMEOUT: int = 30
 
 
 def _escape_regex(s: str) -> str:
@@ -51,6 +77,15 @@ TRIGGER_PATTERN: re.Pattern[str] = re.compile(
     rf"^@{_escape_regex(ASSISTANT_NAME)}\b", re.IGNORECASE
 )
 
+# Lowercased trigger for router.has_trigger's prefix compare. None for a
+# non-ASCII name, whose case folding only TRIGGER_PATTERN gets exactly right.
+TRIGGER_PREFIX: str | None = (
+    f"@{ASSISTANT_NAME}".lower() if ASSISTANT_NAME.isascii() else None
+)
+
+# Agent-private reasoning blocks, stripped before output reaches the chat
+INTERNAL_TAG_RE: re.Pattern[str] = re.compile(r"<internal>[\s\S]*?</internal>")
+
 # Timezone for scheduled tasks (cron expressions, etc.)
 # Uses system timezone by default
 TIMEZONE: str = os.environ.get("TZ", "")
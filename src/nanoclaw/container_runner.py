@@ -10,12 +10,15 @@ All `chatJid` references replaced with `chat_id` for Telegram.
 from __future__ import annotations
 
 import asyncio
-import json
+import functools
+import itertools
 import os
 import time
 from pathlib import Path
 from typing import Any, Callable, Awaitable
 
+import orjson
+
 from .config import (
     CONTAINER_IMAGE,
     CONTAINER_MAX_OUTPUT_SIZE,
@@ -35,8 +38,50 @@ from .types import (
 )
 
 # Markers for structured output in stdout stream
-OUTPUT_START = "===OUTPUT_START==="
-OUTPUT_END = "===OUTPUT_END==="
+OUTPUT_START = "---NANOCLAW_OUTPUT_START---"
+OUTPUT_END = "---NANOCLAW_OUTPUT_END---"
+
+# Container name suffixes: unique within the process, and seeded from the
+# wall clock (ms) so names don't repeat across restarts
+_container_seq = itertools.count(time.time_ns() // 1_000_000)
+
+# Directories already created by this process; mkdir is skipped for these
+_ensured_dirs: set[Path] = set()
+
+
+def _ensure_dir(path: Path) -> None:
+    """mkdir -p *path* once per process."""
+    if path in _ensured_dirs:
+        return
+    path.mkdir(parents=True, exist_ok=True)
+    _ensured_dirs.add(path)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """Atomically replace *path* with *data*.
+
+    Writes and fsyncs a sibling temp file, then renames it over the target
+    with os.replace, so readers never see a partial file. The directory is
+    not fsynced: snapshots are rebuilt from the DB before every run. If the
+    directory was removed since _ensure_dir cached it, it is
+    re-created.
+    """
+    temp_path = path.with_name(path.name + ".tmp")
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+    try:
+        fd = os.open(temp_path, flags, 0o644)
+    except FileNotFoundError:
+        _ensured_dirs.discard(path.parent)
+        _ensure_dir(path.parent)
+        fd = os.open(temp_path, flags, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(temp_path, path)
 
 
 def write_tasks_snapshot(
@@ -46,16 +91,16 @@ def write_tasks_snapshot(
 ) -> None:
     """Write a JSON snapshot of tasks for the container to read."""
     tasks_dir = DATA_DIR / "ipc" / group_folder
-    tasks_dir.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(tasks_dir)
 
     # Non-main groups only see their own tasks
     if not is_main:
         tasks = [t for t in tasks if t.get("groupFolder") == group_folder]
 
-    snapshot_path = tasks_dir / "tasks.json"
-    temp_path = snapshot_path.with_suffix(".json.tmp")
-    temp_path.write_text(json.dumps(tasks, indent=2))
-    temp_path.rename(snapshot_path)
+    atomic_write_bytes(
+        tasks_dir / "tasks.json",
+        orjson.dumps(tasks, option=orjson.OPT_INDENT_2),
+    )
 
 
 def write_groups_snapshot(
@@ -69,7 +114,7 @@ def write_groups_snapshot(
         return  # Non-main groups don't need the groups list
 
     groups_dir = DATA_DIR / "ipc" / group_folder
-    groups_dir.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(groups_dir)
 
     snapshot = [
         {
@@ -81,10 +126,10 @@ def write_groups_snapshot(
         for g in available_groups
     ]
 
-    snapshot_path = groups_dir / "groups.json"
-    temp_path = snapshot_path.with_suffix(".json.tmp")
-    temp_path.write_text(json.dumps(snapshot, indent=2))
-    temp_path.rename(snapshot_path)
+    atomic_write_bytes(
+        groups_dir / "groups.json",
+        orjson.dumps(snapshot, option=orjson.OPT_INDENT_2),
+    )
 
 
 class ContainerRunError(Exception):
@@ -117,7 +162,7 @@ async def run_container_agent(
     """
     # Ensure group directory exists
     group_dir = GROUPS_DIR / group.folder
-    group_dir.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(group_dir)
 
     # IPC directories
     ipc_dir = DATA_DIR / "ipc" / group.folder
@@ -126,10 +171,10 @@ async def run_container_agent(
     messages_dir = ipc_dir / "messages"
     tasks_dir = ipc_dir / "tasks"
 
-    for d in [input_dir, output_dir, messages_dir, tasks_dir]:
-        d.mkdir(parents=True, exist_ok=True)
+    for d in (input_dir, output_dir, messages_dir, tasks_dir):
+        _ensure_dir(d)
 
-    container_name = f"nanoclaw-{group.folder}-{int(time.time())}"
+    container_name = f"nanoclaw-{group.folder}-{next(_container_seq)}"
     is_main = group.folder == MAIN_GROUP_FOLDER
 
     # Build container run command
@@ -163,8 +208,9 @@ async def run_container_agent(
     # Register process for tracking
     register_process(proc, container_name)
 
-    # Write input to stdin
-    stdin_data = input_data.model_dump_json().encode() + b"\n"
+    # Write input to stdin as a single newline-terminated bytes object
+    # (orjson serializes the dataclass directly, in field order)
+    stdin_data = orjson.dumps(input_data, option=orjson.OPT_APPEND_NEWLINE)
     if proc.stdin:
         proc.stdin.write(stdin_data)
         await proc.stdin.drain()
@@ -172,6 +218,7 @@ async def run_container_agent(
 
     # Read and parse output
     final_output = ContainerOutput(status="error", result=None, error="No output received")
+    killed = False
 
     try:
         final_output = await asyncio.wait_for(
@@ -192,21 +239,142 @@ async def run_container_agent(
         # Kill the container process
         try:
             proc.kill()
+            killed = True
         except Exception:
             pass
 
-    # Wait for process to finish
-    try:
-        await asyncio.wait_for(proc.wait(), timeout=10)
-    except asyncio.TimeoutError:
+    # Wait for process to finish; after SIGKILL only a short reap is needed
+    if proc.returncode is None:
         try:
-            proc.kill()
-        except Exception:
-            pass
+            await asyncio.wait_for(proc.wait(), timeout=1 if killed else 10)
+        except asyncio.TimeoutError:
+            try:
+                proc.kill()
+            except Exception:
+                pass
 
     return final_output
 
 
+_OUTPUT_START_BYTES = OUTPUT_START.encode()
+_OUTPUT_END_BYTES = OUTPUT_END.encode()
+_READ_CHUNK_SIZE = 65536
+# A pending line longer than this cannot be an output marker
+_MAX_IDLE_LINE = 4096
+
+
+def _parse_output_block(raw: bytes) -> ContainerOutput | None:
+    """Parse the JSON payload between a pair of output markers."""
+    try:
+        parsed = orjson.loads(raw)
+        result = parsed.get("result")
+        if result is not None and not isinstance(result, str):
+            # Normalize structured results once so consumers get text
+            result = orjson.dumps(result).decode()
+        status = parsed.get("status", "success")
+        new_session_id = parsed.get("newSessionId")
+        error = parsed.get("error")
+        # ContainerOutput does no validation of its own, and this is the
+        # one place it is built from container-supplied data
+        if not isinstance(status, str) or not all(
+            v is None or isinstance(v, str) for v in (new_session_id, error)
+        ):
+            raise ValueError("status, newSessionId and error must be strings")
+        return ContainerOutput(
+            status=status,
+            result=result,
+            new_session_id=new_session_id,
+            error=error,
+        )
+    except (ValueError, AttributeError) as err:
+        logger.warning("Failed to parse container output", error=str(err))
+        return None
+
+
+class _OutputStreamParser:
+    """Incrementally split container stdout into marker-delimited output blocks.
+
+    Fed raw byte chunks; lines are only materialized once complete, and the
+    newline search resumes where the previous chunk's search stopped.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._buf = bytearray()
+        self._scan_from = 0
+        self._block: list[bytes] = []
+        self._in_output = False
+        self._total_size = 0
+        self._skip_line = False  # drop the rest of an oversized line
+
+    def feed(self, data: bytes) -> list[ContainerOutput]:
+        outputs: list[ContainerOutput] = []
+        buf = self._buf
+        buf += data
+        start = 0
+        pos = self._scan_from
+        while (nl := buf.find(b"\n", pos)) != -1:
+            self._handle_line(bytes(buf[start:nl]), outputs)
+            start = pos = nl + 1
+        del buf[:start]
+        self._scan_from = len(buf)
+
+        # Bound memory held by a line that has no newline yet. Anything short
+        # enough to still be a marker is kept until its line completes.
+        pending = len(buf)
+        if pending > _MAX_IDLE_LINE:
+            if not self._in_output:
+                self._drop_pending()
+            elif self._total_size + pending > self._max_size:
+                self._total_size += pending
+                self._truncate()
+                self._drop_pending()
+        return outputs
+
+    def finish(self) -> list[ContainerOutput]:
+        outputs: list[ContainerOutput] = []
+        if self._buf:
+            self._handle_line(bytes(self._buf), outputs)
+            self._drop_pending()
+        return outputs
+
+    def _drop_pending(self) -> None:
+        self._buf.clear()
+        self._scan_from = 0
+        self._skip_line = True
+
+    def _truncate(self) -> None:
+        logger.warning(
+            "Container output exceeds max size, truncating",
+            max_size=self._max_size,
+        )
+        self._in_output = False
+
+    def _handle_line(self, line: bytes, outputs: list[ContainerOutput]) -> None:
+        if self._skip_line:
+            self._skip_line = False
+            return
+
+        if line == _OUTPUT_START_BYTES:
+            self._in_output = True
+            self._block = []
+            return
+
+        if line == _OUTPUT_END_BYTES and self._in_output:
+            self._in_output = False
+            output = _parse_output_block(b"\n".join(self._block))
+            if output is not None:
+                outputs.append(output)
+            return
+
+        if self._in_output:
+            self._total_size += len(line)
+            if self._total_size > self._max_size:
+                self._truncate()
+            else:
+                self._block.append(line)
+
+
 async def _read_container_output(
     proc: asyncio.subprocess.Process,
     on_output: OnOutputFn | None,
@@ -219,52 +387,60 @@ async def _read_container_output(
     assert proc.stdout is not None
 
     final = ContainerOutput(status="error", result=None, error="No output received")
-    buffer: list[str] = []
-    in_output = False
-    total_size = 0
+    parser = _OutputStreamParser(CONTAINER_MAX_OUTPUT_SIZE)
+    read = proc.stdout.read
 
     while True:
-        line_bytes = await proc.stdout.readline()
-        if not line_bytes:
+        chunk = await read(_READ_CHUNK_SIZE)
+        outputs = parser.feed(chunk) if chunk else parser.finish()
+        for output in outputs:
+            final = output
+            if on_output:
+                await on_output(output)
+        if not chunk:
             break  # EOF
 
-        line = line_bytes.decode("utf-8", errors="replace").rstrip("\n")
+    return final
 
-        if line == OUTPUT_START:
-            in_output = True
-            buffer = []
-            continue
 
-        if line == OUTPUT_END and in_output:
-            in_output = False
-            raw = "\n".join(buffer)
-            try:
-                parsed = json.loads(raw)
-                output = ContainerOutput(
-                    status=parsed.get("status", "success"),
-                    result=parsed.get("result"),
-                    new_session_id=parsed.get("newSessionId"),
-                    error=parsed.get("error"),
-                )
-                final = output
-                if on_output:
-                    await on_output(output)
-            except json.JSONDecodeError as err:
-                logger.warning("Failed to parse container output", error=str(err))
-            continue
-
-        if in_output:
-            total_size += len(line)
-            if total_size > CONTAINER_MAX_OUTPUT_SIZE:
-                logger.warning(
-                    "Container output exceeds max size, truncating",
-                    max_size=CONTAINER_MAX_OUTPUT_SIZE,
-                )
-                in_output = False
-            else:
-                buffer.append(line)
+@functools.lru_cache(maxsize=64)
+def _static_command_args(
+    group_folder: str,
+    group_dir: Path,
+    ipc_dir: Path,
+    is_main: bool,
+) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    """Return the invariant (mount, env + entry point) args for a group.
 
-    return final
+    Additional mounts are deliberately not part of this: they are
+    re-validated against the allowlist and the filesystem on every spawn.
+    """
+    mounts = (
+        "--rm",
+        "--memory",
+        "2g",
+        # Mount the group workspace
+        "--mount",
+        f"type=bind,src={group_dir},dst=/workspace/group",
+        # Mount IPC directories
+        "--mount",
+        f"type=bind,src={ipc_dir},dst=/workspace/ipc",
+        # Mount store for shared config/state
+        "--mount",
+        f"type=bind,src={STORE_DIR},dst=/workspace/store,readonly",
+    )
+    tail = (
+        # Environment variables
+        "--env",
+        f"GROUP_FOLDER={group_folder}",
+        "--env",
+        f"IS_MAIN={'true' if is_main else 'false'}",
+        # Image and entry point
+        CONTAINER_IMAGE,
+        "python",
+        "/app/main.py",
+    )
+    return mounts, tail
 
 
 def _build_container_command(
@@ -279,24 +455,8 @@ def _build_container_command(
     This produces the command line for `container run` with appropriate
     mounts, environment variables, and the agent-runner entry point.
     """
-    cmd = [
-        "container",
-        "run",
-        "--name",
-        container_name,
-        "--rm",
-        "--memory",
-        "2g",
-    ]
-
-    # Mount the group workspace
-    cmd.extend(["--mount", f"type=bind,src={group_dir},dst=/workspace/group"])
-
-    # Mount IPC directories
-    cmd.extend(["--mount", f"type=bind,src={ipc_dir},dst=/workspace/ipc"])
-
-    # Mount store for shared config/state
-    cmd.extend(["--mount", f"type=bind,src={STORE_DIR},dst=/workspace/store,readonly"])
+    mounts, tail = _static_command_args(group.folder, group_dir, ipc_dir, is_main)
+    cmd = ["container", "run", "--name", container_name, *mounts]
 
     # Additional mounts (validated)
     if group.container_config and group.container_config.additional_mounts:
@@ -312,23 +472,50 @@ def _build_container_command(
                 f"type=bind,src={mount.host_path},dst={mount.container_path}{ro}",
             ])
 
-    # Environment variables
-    cmd.extend(["--env", f"GROUP_FOLDER={group.folder}"])
-    cmd.extend(["--env", f"IS_MAIN={'true' if is_main else 'false'}"])
+    cmd.extend(tail)
+    return cmd
 
-    # Image and entry point
-    cmd.extend([CONTAINER_IMAGE, "python", "/app/main.py"])
 
-    return cmd
+# Time of the last successful runtime probe; reused for _RUNTIME_CHECK_TTL_S.
+# Failures are never cached, so a runtime that comes up is seen at once.
+_RUNTIME_CHECK_TTL_S = 30.0
+_runtime_ok_at: float | None = None
+_runtime_check_lock: asyncio.Lock | None = None
 
 
 async def ensure_container_system_running() -> bool:
-    """Check that the container runtime is available."""
+    """Check that the container runtime is available.
+
+    A successful result is cached briefly, and concurrent callers wait on a
+    single ``container version`` probe rather than each starting one.
+    """
+    global _runtime_ok_at, _runtime_check_lock
+
+    def fresh() -> bool:
+        return (
+            _runtime_ok_at is not None
+            and time.monotonic() - _runtime_ok_at < _RUNTIME_CHECK_TTL_S
+        )
+
+    if fresh():
+        return True
+    if _runtime_check_lock is None:
+        _runtime_check_lock = asyncio.Lock()
+    async with _runtime_check_lock:
+        if fresh():
+            return True
+        if not await _probe_container_system():
+            return False
+        _runtime_ok_at = time.monotonic()
+        return True
+
+
+async def _probe_container_system() -> bool:
     try:
         proc = await asyncio.create_subprocess_exec(
             "container", "version",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
         )
         await proc.wait()
         return proc.returncode == 0
@@ -0,0 +1,27 @@
+"""Cron expression helpers shared by the scheduler and IPC."""
+
+from __future__ import annotations
+
+import copy
+import functools
+import time
+from datetime import datetime, timezone
+
+from croniter import croniter
+
+
+@functools.lru_cache(maxsize=1024)
+def _parsed_cron(expr: str) -> croniter:
+    return croniter(expr)
+
+
+def next_cron_run(expr: str, now: float | None = None) -> str:
+    """ISO timestamp (UTC) of the first run of *expr* after *now*.
+
+    The parsed expression is cached; each call iterates a fresh copy of it,
+    so the cached instance is never advanced. Raises CroniterError (a
+    ValueError) if the expression is invalid or never fires.
+    """
+    cron = copy.copy(_parsed_cron(expr))
+    cron.set_current(time.time() if now is None else now, force=True)
+    return datetime.fromtimestamp(cron.get_next(float), tz=timezone.utc).isoformat()
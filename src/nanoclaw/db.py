@@ -6,19 +6,38 @@ for Telegram integration.
 
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
 import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, TypeVar
 
-from .config import DATA_DIR, STORE_DIR
+from .config import ASSISTANT_NAME, DATA_DIR, STORE_DIR
 from .logger import logger
-from .types import NewMessage, RegisteredGroup, ScheduledTask, TaskRunLog
+from .types import ContainerConfig, NewMessage, RegisteredGroup, ScheduledTask, TaskRunLog
+
+_T = TypeVar("_T")
 
 # Module-level database connection
 _db: sqlite3.Connection | None = None
 
+# Async callers hand writes to a single dedicated thread so commits (and
+# their fsyncs) never stall the event loop. Write functions also hold
+# _write_lock, so a synchronous write from the loop thread cannot interleave
+# with a transaction the writer thread has open on the shared connection.
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+_write_lock = threading.RLock()
+
+# Messages carry a precomputed is_bot flag so reads filter on an integer
+# instead of matching a LIKE pattern per row. The flag mirrors
+# "content LIKE '<ASSISTANT_NAME>:%'", which is ASCII case-insensitive.
+_BOT_PREFIX = f"{ASSISTANT_NAME}:"
+_BOT_PREFIX_LOWER = _BOT_PREFIX.lower()
+
 
 def _get_db() -> sqlite3.Connection:
     """Get the active database connection (must call init_database first)."""
@@ -27,6 +46,32 @@ def _get_db() -> sqlite3.Connection:
     return _db
 
 
+def _write(fn: Callable[..., _T]) -> Callable[..., _T]:
+    """Serialize a write function against all other writes."""
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> _T:
+        with _write_lock:
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def submit_write(fn: Callable[..., _T], *args: Any) -> Future[_T]:
+    """Queue a write on the writer thread without waiting (FIFO order)."""
+    return _writer.submit(fn, *args)
+
+
+async def run_write(fn: Callable[..., _T], *args: Any) -> _T:
+    """Run a write on the writer thread and await its result."""
+    return await asyncio.wrap_future(_writer.submit(fn, *args))
+
+
+async def wait_for_writes() -> None:
+    """Wait until every write queued so far has completed."""
+    await run_write(lambda: None)
+
+
 def _create_schema(database: sqlite3.Connection) -> None:
     """Create all tables and indexes if they don't exist."""
     database.executescript("""
@@ -44,10 +89,14 @@ def _create_schema(database: sqlite3.Connection) -> None:
             content TEXT,
             timestamp TEXT,
             is_from_me INTEGER,
+            is_bot INTEGER NOT NULL DEFAULT 0,
             PRIMARY KEY (id, chat_id),
             FOREIGN KEY (chat_id) REFERENCES chats(chat_id)
         );
-        CREATE INDEX IF NOT EXISTS idx_timestamp ON messages(timestamp);
+        -- Message reads seek idx_messages_nonbot (see _migrate_bot_flag),
+        -- which replaces these, so inserts maintain a single chat index
+        DROP INDEX IF EXISTS idx_messages_chat_ts;
+        DROP INDEX IF EXISTS idx_timestamp;
 
         CREATE TABLE IF NOT EXISTS scheduled_tasks (
             id TEXT PRIMARY KEY,
@@ -98,6 +147,58 @@ def _create_schema(database: sqlite3.Connection) -> None:
             requires_trigger INTEGER DEFAULT 1
         );
     """)
+    _migrate_bot_flag(database)
+
+
+def _migrate_bot_flag(database: sqlite3.Connection) -> None:
+    """Add and backfill messages.is_bot, plus its partial index.
+
+    The index is the only one on messages(chat_id, timestamp). It is
+    deliberately not covering: content dominates row size, and the seek
+    already limits table reads to the rows in range.
+    The flag depends on ASSISTANT_NAME, so the name it was computed for is
+    kept in router_state and all rows are re-flagged when it changes.
+    """
+    columns = {row[1] for row in database.execute("PRAGMA table_info(messages)")}
+    if "is_bot" not in columns:
+        database.execute(
+            "ALTER TABLE messages ADD COLUMN is_bot INTEGER NOT NULL DEFAULT 0"
+        )
+    database.execute(
+        "CREATE INDEX IF NOT EXISTS idx_messages_nonbot "
+        "ON messages(chat_id, timestamp) WHERE is_bot = 0"
+    )
+
+    row = database.execute(
+        "SELECT value FROM router_state WHERE key = 'bot_prefix'"
+    ).fetchone()
+    if row is None or row[0] != _BOT_PREFIX:
+        with database:
+            database.execute(
+                "UPDATE messages SET is_bot = (content LIKE ?)",
+                (f"{_BOT_PREFIX}%",),
+            )
+            database.execute(
+                "INSERT OR REPLACE INTO router_state (key, value) VALUES ('bot_prefix', ?)",
+                (_BOT_PREFIX,),
+            )
+
+
+def _configure_connection(database: sqlite3.Connection) -> None:
+    """Apply on-disk pragmas: WAL journaling with one fsync per checkpoint.
+
+    synchronous=NORMAL is durable across application crashes in WAL mode;
+    only an OS crash can lose the most recent commits. journal_size_limit
+    truncates the WAL after checkpoints so it cannot grow unbounded.
+    """
+    database.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA busy_timeout=5000;
+        PRAGMA journal_size_limit=67108864;
+    """)
 
 
 def init_database() -> None:
@@ -106,20 +207,35 @@ def init_database() -> None:
     db_path = STORE_DIR / "messages.db"
     db_path.parent.mkdir(parents=True, exist_ok=True)
 
-    _db = sqlite3.connect(str(db_path))
+    _db = sqlite3.connect(str(db_path), check_same_thread=False)
     _db.row_factory = sqlite3.Row
+    _configure_connection(_db)
     _create_schema(_db)
+    _db.execute("PRAGMA optimize")
 
     # Migrate from JSON files if they exist
     _migrate_json_state()
 
 
+# Serialized empty schema, so each test database after the first is a copy
+_test_template: bytes | None = None
+
+
 def _init_test_database() -> None:
-    """Create a fresh in-memory database (for tests only)."""
-    global _db
-    _db = sqlite3.connect(":memory:")
+    """Create a fresh in-memory database (for tests only).
+
+    The schema is built once per process; later calls restore a copy of
+    it, which is ~20x cheaper than re-running the DDL.
+    """
+    global _db, _test_template
+    _db = sqlite3.connect(":memory:", check_same_thread=False)
     _db.row_factory = sqlite3.Row
-    _create_schema(_db)
+    if _test_template is None:
+        _create_schema(_db)
+        _test_template = _db.serialize()
+    else:
+        _db.deserialize(_test_template)
+    _tasks_changed()
 
 
 # ---------------------------------------------------------------------------
@@ -127,6 +243,7 @@ def _init_test_database() -> None:
 # ---------------------------------------------------------------------------
 
 
+@_write
 def store_chat_metadata(
     chat_id: str,
     timestamp: str,
@@ -156,6 +273,24 @@ def store_chat_metadata(
     db.commit()
 
 
+@_write
+def store_chats_metadata(entries: list[tuple[str, str]]) -> None:
+    """Store (chat_id, timestamp) activity for many chats in one transaction."""
+    if not entries:
+        return
+    db = _get_db()
+    db.executemany(
+        """
+        INSERT INTO chats (chat_id, name, last_message_time) VALUES (?, ?, ?)
+        ON CONFLICT(chat_id) DO UPDATE SET
+            last_message_time = MAX(last_message_time, excluded.last_message_time)
+        """,
+        [(chat_id, chat_id, timestamp) for chat_id, timestamp in entries],
+    )
+    db.commit()
+
+
+@_write
 def update_chat_name(chat_id: str, name: str) -> None:
     """Update chat name without changing timestamp for existing chats."""
     db = _get_db()
@@ -173,6 +308,8 @@ def update_chat_name(chat_id: str, name: str) -> None:
 class ChatInfo:
     """Lightweight chat info (from db row)."""
 
+    __slots__ = ("chat_id", "name", "last_message_time")
+
     def __init__(self, chat_id: str, name: str, last_message_time: str) -> None:
         self.chat_id = chat_id
         self.name = name
@@ -182,10 +319,10 @@ class ChatInfo:
 def get_all_chats() -> list[ChatInfo]:
     """Get all known chats, ordered by most recent activity."""
     db = _get_db()
-    rows = db.execute(
+    cursor = db.execute(
         "SELECT chat_id, name, last_message_time FROM chats ORDER BY last_message_time DESC"
-    ).fetchall()
-    return [ChatInfo(r["chat_id"], r["name"], r["last_message_time"]) for r in rows]
+    )
+    return [ChatInfo(r["chat_id"], r["name"], r["last_message_time"]) for r in cursor]
 
 
 # ---------------------------------------------------------------------------
@@ -195,20 +332,32 @@ def get_all_chats() -> list[ChatInfo]:
 
 def store_message(msg: NewMessage) -> None:
     """Store a message with full content (for registered groups)."""
+    store_messages([msg])
+
+
+@_write
+def store_messages(msgs: list[NewMessage]) -> None:
+    """Store many messages in one transaction."""
+    if not msgs:
+        return
     db = _get_db()
-    db.execute(
+    db.executemany(
         """INSERT OR REPLACE INTO messages
-           (id, chat_id, sender, sender_name, content, timestamp, is_from_me)
-           VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (
-            msg.id,
-            msg.chat_id,
-            msg.sender,
-            msg.sender_name,
-            msg.content,
-            msg.timestamp,
-            1 if msg.is_from_me else 0,
-        ),
+           (id, chat_id, sender, sender_name, content, timestamp, is_from_me, is_bot)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (
+                msg.id,
+                msg.chat_id,
+                msg.sender,
+                msg.sender_name,
+                msg.content,
+                msg.timestamp,
+                1 if msg.is_from_me else 0,
+                1 if msg.content[:len(_BOT_PREFIX)].lower() == _BOT_PREFIX_LOWER else 0,
+            )
+            for msg in msgs
+        ],
     )
     db.commit()
 
@@ -216,9 +365,8 @@ def store_message(msg: NewMessage) -> None:
 def get_new_messages(
     chat_ids: list[str],
     last_timestamp: str,
-    bot_prefix: str,
 ) -> tuple[list[NewMessage], str]:
-    """Get new messages across multiple chats since a timestamp."""
+    """Get new non-bot messages across multiple chats since a timestamp."""
     if not chat_ids:
         return [], last_timestamp
 
@@ -226,16 +374,12 @@ def get_new_messages(
     sql = f"""
         SELECT id, chat_id, sender, sender_name, content, timestamp
         FROM messages
-        WHERE timestamp > ? AND chat_id IN ({placeholders}) AND content NOT LIKE ?
+        WHERE is_bot = 0 AND timestamp > ? AND chat_id IN ({placeholders})
         ORDER BY timestamp
     """
     db = _get_db()
-    rows = db.execute(sql, [last_timestamp, *chat_ids, f"{bot_prefix}:%"]).fetchall()
-
-    messages: list[NewMessage] = []
-    new_timestamp = last_timestamp
-    for row in rows:
-        msg = NewMessage(
+    messages = [
+        NewMessage(
             id=row["id"],
             chat_id=row["chat_id"],
             sender=row["sender"],
@@ -243,28 +387,28 @@ def get_new_messages(
             content=row["content"],
             timestamp=row["timestamp"],
         )
-        messages.append(msg)
-        if row["timestamp"] > new_timestamp:
-            new_timestamp = row["timestamp"]
+        for row in db.execute(sql, [last_timestamp, *chat_ids])
+    ]
 
+    # Rows are ordered by timestamp, so the last one carries the new maximum
+    new_timestamp = messages[-1].timestamp if messages else last_timestamp
     return messages, new_timestamp
 
 
 def get_messages_since(
     chat_id: str,
     since_timestamp: str,
-    bot_prefix: str,
 ) -> list[NewMessage]:
-    """Get messages for a single chat since a timestamp."""
+    """Get non-bot messages for a single chat since a timestamp."""
     db = _get_db()
     rows = db.execute(
         """
         SELECT id, chat_id, sender, sender_name, content, timestamp
         FROM messages
-        WHERE chat_id = ? AND timestamp > ? AND content NOT LIKE ?
+        WHERE is_bot = 0 AND chat_id = ? AND timestamp > ?
         ORDER BY timestamp
         """,
-        (chat_id, since_timestamp, f"{bot_prefix}:%"),
+        (chat_id, since_timestamp),
     ).fetchall()
 
     return [
@@ -284,30 +428,51 @@ def get_messages_since(
 # Scheduled tasks
 # ---------------------------------------------------------------------------
 
+# Bumped after every write to scheduled_tasks; keys the snapshot cache below
+_tasks_version = 0
+_task_snapshot: tuple[int, list[dict[str, Any]]] | None = None
+
+
+def _tasks_changed() -> None:
+    global _tasks_version
+    _tasks_version += 1
+
 
 def create_task(task: ScheduledTask) -> None:
     """Insert a new scheduled task."""
+    create_tasks([task])
+
+
+@_write
+def create_tasks(tasks: list[ScheduledTask]) -> None:
+    """Insert several scheduled tasks in one transaction."""
+    if not tasks:
+        return
     db = _get_db()
-    db.execute(
+    db.executemany(
         """
         INSERT INTO scheduled_tasks
             (id, group_folder, chat_id, prompt, schedule_type, schedule_value,
              context_mode, next_run, status, created_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
-        (
-            task.id,
-            task.group_folder,
-            task.chat_id,
-            task.prompt,
-            task.schedule_type,
-            task.schedule_value,
-            task.context_mode or "isolated",
-            task.next_run,
-            task.status,
-            task.created_at,
-        ),
+        [
+            (
+                task.id,
+                task.group_folder,
+                task.chat_id,
+                task.prompt,
+                task.schedule_type,
+                task.schedule_value,
+                task.context_mode or "isolated",
+                task.next_run,
+                task.status,
+                task.created_at,
+            )
+            for task in tasks
+        ],
     )
+    _tasks_changed()
     db.commit()
 
 
@@ -337,6 +502,36 @@ def get_all_tasks() -> list[ScheduledTask]:
     return [_row_to_task(r) for r in rows]
 
 
+def get_task_snapshot() -> list[dict[str, Any]]:
+    """All tasks in the form written to each container's tasks.json.
+
+    The list is rebuilt only after a task write and is shared between
+    callers, so it must not be mutated.
+    """
+    global _task_snapshot
+    # Read the version first: a write landing mid-rebuild then just
+    # forces another rebuild next time
+    version = _tasks_version
+    if _task_snapshot is not None and _task_snapshot[0] == version:
+        return _task_snapshot[1]
+
+    rows = [
+        {
+            "id": t.id,
+            "groupFolder": t.group_folder,
+            "prompt": t.prompt,
+            "schedule_type": t.schedule_type,
+            "schedule_value": t.schedule_value,
+            "status": t.status,
+            "next_run": t.next_run,
+        }
+        for t in get_all_tasks()
+    ]
+    _task_snapshot = (version, rows)
+    return rows
+
+
+@_write
 def update_task(task_id: str, **updates: Any) -> None:
     """Update one or more fields on a scheduled task.
 
@@ -361,14 +556,17 @@ def update_task(task_id: str, **updates: Any) -> None:
         f"UPDATE scheduled_tasks SET {', '.join(fields)} WHERE id = ?",
         values,
     )
+    _tasks_changed()
     db.commit()
 
 
+@_write
 def delete_task(task_id: str) -> None:
     """Delete a scheduled task and its run logs."""
     db = _get_db()
     db.execute("DELETE FROM task_run_logs WHERE task_id = ?", (task_id,))
     db.execute("DELETE FROM scheduled_tasks WHERE id = ?", (task_id,))
+    _tasks_changed()
     db.commit()
 
 
@@ -387,14 +585,64 @@ def get_due_tasks() -> list[ScheduledTask]:
     return [_row_to_task(r) for r in rows]
 
 
+def get_next_run_after(after: str) -> str | None:
+    """Earliest next_run of an active task that is later than *after*."""
+    row = _get_db().execute(
+        """
+        SELECT MIN(next_run) FROM scheduled_tasks
+        WHERE status = 'active' AND next_run > ?
+        """,
+        (after,),
+    ).fetchone()
+    next_run: str | None = row[0]
+    return next_run
+
+
+@_write
 def update_task_after_run(
     task_id: str,
     next_run: str | None,
     last_result: str,
 ) -> None:
     """Update task after it has been executed."""
+    db = _get_db()
     now = datetime.now(timezone.utc).isoformat()
+    _execute_task_after_run(db, task_id, next_run, last_result, now)
+    db.commit()
+
+
+@_write
+def log_task_run(log: TaskRunLog) -> None:
+    """Insert a task run log entry."""
     db = _get_db()
+    _execute_log_task_run(db, log)
+    db.commit()
+
+
+@_write
+def finish_task_run(
+    task_id: str,
+    next_run: str | None,
+    last_result: str,
+    log: TaskRunLog,
+) -> None:
+    """Log a task run and update the task in a single transaction.
+
+    The run's timestamp doubles as the task's last_run.
+    """
+    db = _get_db()
+    _execute_log_task_run(db, log)
+    _execute_task_after_run(db, task_id, next_run, last_result, log.started_at)
+    db.commit()
+
+
+def _execute_task_after_run(
+    db: sqlite3.Connection,
+    task_id: str,
+    next_run: str | None,
+    last_result: str,
+    last_run: str,
+) -> None:
     db.execute(
         """
         UPDATE scheduled_tasks
@@ -402,14 +650,12 @@ def update_task_after_run(
             status = CASE WHEN ? IS NULL THEN 'completed' ELSE status END
         WHERE id = ?
         """,
-        (next_run, now, last_result, next_run, task_id),
+        (next_run, last_run, last_result, next_run, task_id),
     )
-    db.commit()
+    _tasks_changed()
 
 
-def log_task_run(log: TaskRunLog) -> None:
-    """Insert a task run log entry."""
-    db = _get_db()
+def _execute_log_task_run(db: sqlite3.Connection, log: TaskRunLog) -> None:
     db.execute(
         """
         INSERT INTO task_run_logs (task_id, run_at, duration_ms, status, result, error)
@@ -417,12 +663,11 @@ def log_task_run(log: TaskRunLog) -> None:
         """,
         (log.task_id, log.started_at, 0, log.status, None, log.error),
     )
-    db.commit()
 
 
 def _row_to_task(row: sqlite3.Row) -> ScheduledTask:
-    """Convert a db row to a ScheduledTask model."""
-    return ScheduledTask(
+    """Convert a db row to a ScheduledTask model (trusted, so unvalidated)."""
+    return ScheduledTask.model_construct(
         id=row["id"],
         group_folder=row["group_folder"],
         chat_id=row["chat_id"],
@@ -451,8 +696,19 @@ def get_router_state(key: str) -> str | None:
 
 def set_router_state(key: str, value: str) -> None:
     """Set a value in the router_state key-value store."""
+    set_router_states({key: value})
+
+
+@_write
+def set_router_states(values: dict[str, str]) -> None:
+    """Set several router_state keys in one transaction."""
+    if not values:
+        return
     db = _get_db()
-    db.execute("INSERT OR REPLACE INTO router_state (key, value) VALUES (?, ?)", (key, value))
+    db.executemany(
+        "INSERT OR REPLACE INTO router_state (key, value) VALUES (?, ?)",
+        values.items(),
+    )
     db.commit()
 
 
@@ -472,10 +728,18 @@ def get_session(group_folder: str) -> str | None:
 
 def set_session(group_folder: str, session_id: str) -> None:
     """Store a Claude session ID for a group folder."""
+    set_sessions({group_folder: session_id})
+
+
+@_write
+def set_sessions(sessions: dict[str, str]) -> None:
+    """Store several group_folder → session_id mappings in one transaction."""
+    if not sessions:
+        return
     db = _get_db()
-    db.execute(
+    db.executemany(
         "INSERT OR REPLACE INTO sessions (group_folder, session_id) VALUES (?, ?)",
-        (group_folder, session_id),
+        sessions.items(),
     )
     db.commit()
 
@@ -501,9 +765,8 @@ def get_registered_group(chat_id: str) -> RegisteredGroup | None:
     return _row_to_registered_group(row)
 
 
-def set_registered_group(chat_id: str, group: RegisteredGroup) -> None:
-    """Insert or update a registered group."""
-    db = _get_db()
+def _registered_group_row(chat_id: str, group: RegisteredGroup) -> tuple[Any, ...]:
+    """Build the registered_groups row tuple for a group."""
     container_config_json: str | None = None
     if group.container_config is not None:
         container_config_json = group.container_config.model_dump_json()
@@ -514,19 +777,33 @@ def set_registered_group(chat_id: str, group: RegisteredGroup) -> None:
     else:
         requires_trigger_val = 1 if group.requires_trigger else 0
 
-    db.execute(
+    return (
+        chat_id,
+        group.name,
+        group.folder,
+        group.trigger,
+        group.added_at,
+        container_config_json,
+        requires_trigger_val,
+    )
+
+
+def set_registered_group(chat_id: str, group: RegisteredGroup) -> None:
+    """Insert or update a registered group."""
+    set_registered_groups({chat_id: group})
+
+
+@_write
+def set_registered_groups(groups: dict[str, RegisteredGroup]) -> None:
+    """Insert or update several registered groups in one transaction."""
+    if not groups:
+        return
+    db = _get_db()
+    db.executemany(
         """INSERT OR REPLACE INTO registered_groups
            (chat_id, name, folder, trigger_pattern, added_at, container_config, requires_trigger)
            VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (
-            chat_id,
-            group.name,
-            group.folder,
-            group.trigger,
-            group.added_at,
-            container_config_json,
-            requires_trigger_val,
-        ),
+        [_registered_group_row(chat_id, group) for chat_id, group in groups.items()],
     )
     db.commit()
 
@@ -534,20 +811,26 @@ def set_registered_group(chat_id: str, group: RegisteredGroup) -> None:
 def get_all_registered_groups() -> dict[str, RegisteredGroup]:
     """Get all registered groups as a dict keyed by chat_id."""
     db = _get_db()
-    rows = db.execute("SELECT * FROM registered_groups").fetchall()
-    result: dict[str, RegisteredGroup] = {}
-    for row in rows:
-        result[row["chat_id"]] = _row_to_registered_group(row)
-    return result
+    return {
+        row["chat_id"]: _row_to_registered_group(row)
+        for row in db.execute("SELECT * FROM registered_groups")
+    }
 
 
-def _row_to_registered_group(row: sqlite3.Row) -> RegisteredGroup:
-    """Convert a db row to a RegisteredGroup model."""
-    from .types import ContainerConfig
+@functools.lru_cache(maxsize=256)
+def _parse_container_config(raw: str) -> ContainerConfig:
+    """Parse a stored container_config; groups often share identical configs.
+
+    The returned model is shared between callers and must not be mutated.
+    """
+    return ContainerConfig.model_validate_json(raw)
+
 
+def _row_to_registered_group(row: sqlite3.Row) -> RegisteredGroup:
+    """Convert a db row to a RegisteredGroup model (trusted, so unvalidated)."""
     container_config = None
     if row["container_config"]:
-        container_config = ContainerConfig.model_validate_json(row["container_config"])
+        container_config = _parse_container_config(row["container_config"])
 
     requires_trigger: bool | None
     rt_val = row["requires_trigger"]
@@ -556,7 +839,7 @@ def _row_to_registered_group(row: sqlite3.Row) -> RegisteredGroup:
     else:
         requires_trigger = bool(rt_val)
 
-    return RegisteredGroup(
+    return RegisteredGroup.model_construct(
         name=row["name"],
         folder=row["folder"],
         trigger=row["trigger_pattern"],
@@ -588,23 +871,22 @@ def _migrate_json_state() -> None:
     # Migrate router_state.json
     router_state = _migrate_file("router_state.json")
     if router_state and isinstance(router_state, dict):
+        state: dict[str, str] = {}
         if "last_timestamp" in router_state:
-            set_router_state("last_timestamp", router_state["last_timestamp"])
+            state["last_timestamp"] = router_state["last_timestamp"]
         if "last_agent_timestamp" in router_state:
-            set_router_state(
-                "last_agent_timestamp",
-                json.dumps(router_state["last_agent_timestamp"]),
-            )
+            state["last_agent_timestamp"] = json.dumps(router_state["last_agent_timestamp"])
+        set_router_states(state)
 
     # Migrate sessions.json
     sessions = _migrate_file("sessions.json")
     if sessions and isinstance(sessions, dict):
-        for folder, session_id in sessions.items():
-            set_session(folder, session_id)
+        set_sessions(sessions)
 
     # Migrate registered_groups.json
     groups = _migrate_file("registered_groups.json")
     if groups and isinstance(groups, dict):
-        for chat_id, group_data in groups.items():
-            group = RegisteredGroup.model_validate(group_data)
-            set_registered_group(chat_id, group)
+        set_registered_groups({
+            chat_id: RegisteredGroup.model_validate(group_data)
+            for chat_id, group_data in groups.items()
+        })
@@ -9,20 +9,39 @@ All `groupJid` references replaced with `chat_id` for Telegram.
 from __future__ import annotations
 
 import asyncio
-import json
+import heapq
+import itertools
 import os
+import random
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Callable, Awaitable
 
-from .config import DATA_DIR, MAX_CONCURRENT_CONTAINERS
+import orjson
+
+from .config import DATA_DIR, GROUP_WEIGHTS, MAX_CONCURRENT_CONTAINERS
 from .logger import logger
 
 MAX_RETRIES = 5
 BASE_RETRY_SECONDS = 5.0
+MAX_RETRY_DELAY_SECONDS = 300.0
 
 ProcessMessagesFn = Callable[[str], Awaitable[bool]]
 
+# Process-local PRNG (seeded once) for retry jitter and for filename
+# suffixes, which only need to be unique within a millisecond
+_rng = random.Random(os.urandom(16))
+
+# IPC input directories already created by this process
+_ensured_input_dirs: set[Path] = set()
+
+# Follow-up messages and close sentinels are written by one dedicated
+# thread, so they land in the order they were issued: a close can never
+# overtake a message write that is still pending
+_ipc_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ipc-input-writer")
+
 
 class _QueuedTask:
     """A task waiting in the queue."""
@@ -42,29 +61,91 @@ class _GroupState:
         "active",
         "pending_messages",
         "pending_tasks",
+        "pending_task_ids",
         "process",
         "container_name",
         "group_folder",
         "retry_count",
+        "weight",
+        "vtime",
+        "log",
     )
 
     def __init__(self) -> None:
         self.active: bool = False
         self.pending_messages: bool = False
-        self.pending_tasks: list[_QueuedTask] = []
+        self.pending_tasks: deque[_QueuedTask] = deque()
+        self.pending_task_ids: set[str] = set()
         self.process: asyncio.subprocess.Process | None = None
         self.container_name: str | None = None
         self.group_folder: str | None = None
         self.retry_count: int = 0
+        self.weight: float = 1.0
+        self.vtime: float = 0.0  # virtual finish time for fair queueing
+        self.log = logger  # rebound with chat_id by GroupQueue._get_group
+
+    def push_task(self, task: _QueuedTask) -> None:
+        self.pending_tasks.append(task)
+        self.pending_task_ids.add(task.id)
+
+    def pop_task(self) -> _QueuedTask:
+        task = self.pending_tasks.popleft()
+        self.pending_task_ids.discard(task.id)
+        return task
+
+    def reset(self) -> None:
+        """Clear the per-run fields once the group's container has exited."""
+        self.active = False
+        self.process = None
+        self.container_name = None
+        self.group_folder = None
+
+
+def _ensure_input_dir(input_dir: Path) -> None:
+    if input_dir not in _ensured_input_dirs:
+        input_dir.mkdir(parents=True, exist_ok=True)
+        _ensured_input_dirs.add(input_dir)
+
+
+def _write_ipc_message(input_dir: Path, text: str) -> bool:
+    """Atomically drop a message file into a container's IPC input dir."""
+    try:
+        _ensure_input_dir(input_dir)
+        filename = f"{int(time.time() * 1000)}-{_rng.getrandbits(24):06x}.json"
+        filepath = input_dir / filename
+        temp_path = filepath.with_suffix(".json.tmp")
+        temp_path.write_bytes(orjson.dumps({"type": "message", "text": text}))
+        os.replace(temp_path, filepath)
+        return True
+    except Exception:
+        # The directory may have been removed underneath us; recreate next time
+        _ensured_input_dirs.discard(input_dir)
+        return False
+
+
+def _write_close_sentinel(input_dir: Path) -> None:
+    try:
+        _ensure_input_dir(input_dir)
+        (input_dir / "_close").write_text("")
+    except Exception:
+        _ensured_input_dirs.discard(input_dir)
 
 
 class GroupQueue:
     """Manages per-group container queueing with global concurrency limits."""
 
-    def __init__(self) -> None:
+    def __init__(self, max_concurrent: int | None = None) -> None:
         self._groups: dict[str, _GroupState] = {}
         self._active_count: int = 0
-        self._waiting: list[str] = []
+        self._max_concurrent: int = (
+            MAX_CONCURRENT_CONTAINERS if max_concurrent is None else max_concurrent
+        )
+        # Groups waiting for a concurrency slot: a min-heap on virtual
+        # finish time (weighted fair queueing), FIFO among equal times
+        self._waiting: list[tuple[float, int, str]] = []
+        self._waiting_ids: set[str] = set()
+        self._waiting_seq = itertools.count()
+        self._vclock: float = 0.0
         self._process_messages_fn: ProcessMessagesFn | None = None
         self._shutting_down: bool = False
 
@@ -72,9 +153,20 @@ class GroupQueue:
         state = self._groups.get(chat_id)
         if state is None:
             state = _GroupState()
+            state.weight = GROUP_WEIGHTS.get(chat_id, 1.0)
+            state.log = logger.bind(chat_id=chat_id)
             self._groups[chat_id] = state
         return state
 
+    def _add_waiting(self, chat_id: str, state: _GroupState) -> None:
+        if chat_id in self._waiting_ids:
+            return
+        # A group returning from idle starts at the current virtual time
+        # rather than spending credit it accumulated while away
+        state.vtime = max(state.vtime, self._vclock)
+        heapq.heappush(self._waiting, (state.vtime, next(self._waiting_seq), chat_id))
+        self._waiting_ids.add(chat_id)
+
     def set_process_messages_fn(self, fn: ProcessMessagesFn) -> None:
         self._process_messages_fn = fn
 
@@ -87,21 +179,19 @@ class GroupQueue:
 
         if state.active:
             state.pending_messages = True
-            logger.debug("Container active, message queued", chat_id=chat_id)
+            state.log.debug("Container active, message queued")
             return
 
-        if self._active_count >= MAX_CONCURRENT_CONTAINERS:
+        if self._active_count >= self._max_concurrent:
             state.pending_messages = True
-            if chat_id not in self._waiting:
-                self._waiting.append(chat_id)
-            logger.debug(
+            self._add_waiting(chat_id, state)
+            state.log.debug(
                 "At concurrency limit, message queued",
-                chat_id=chat_id,
                 active_count=self._active_count,
             )
             return
 
-        asyncio.create_task(self._run_for_group(chat_id, "messages"))
+        self._start_messages(chat_id, state, "messages")
 
     def enqueue_task(
         self,
@@ -116,28 +206,26 @@ class GroupQueue:
         state = self._get_group(chat_id)
 
         # Prevent double-queuing
-        if any(t.id == task_id for t in state.pending_tasks):
-            logger.debug("Task already queued, skipping", chat_id=chat_id, task_id=task_id)
+        if task_id in state.pending_task_ids:
+            state.log.debug("Task already queued, skipping", task_id=task_id)
             return
 
         if state.active:
-            state.pending_tasks.append(_QueuedTask(task_id, chat_id, fn))
-            logger.debug("Container active, task queued", chat_id=chat_id, task_id=task_id)
+            state.push_task(_QueuedTask(task_id, chat_id, fn))
+            state.log.debug("Container active, task queued", task_id=task_id)
             return
 
-        if self._active_count >= MAX_CONCURRENT_CONTAINERS:
-            state.pending_tasks.append(_QueuedTask(task_id, chat_id, fn))
-            if chat_id not in self._waiting:
-                self._waiting.append(chat_id)
-            logger.debug(
+        if self._active_count >= self._max_concurrent:
+            state.push_task(_QueuedTask(task_id, chat_id, fn))
+            self._add_waiting(chat_id, state)
+            state.log.debug(
                 "At concurrency limit, task queued",
-                chat_id=chat_id,
                 task_id=task_id,
                 active_count=self._active_count,
             )
             return
 
-        asyncio.create_task(self._run_task(chat_id, _QueuedTask(task_id, chat_id, fn)))
+        self._start_task(chat_id, state, _QueuedTask(task_id, chat_id, fn))
 
     def register_process(
         self,
@@ -153,47 +241,57 @@ class GroupQueue:
         if group_folder:
             state.group_folder = group_folder
 
-    def send_message(self, chat_id: str, text: str) -> bool:
-        """Send a follow-up message to the active container via IPC file."""
+    async def send_message(self, chat_id: str, text: str) -> bool:
+        """Send a follow-up message to the active container via IPC file.
+
+        The file is written on the IPC writer thread to keep disk latency
+        off the event loop.
+        """
         state = self._get_group(chat_id)
         if not state.active or not state.group_folder:
             return False
 
         input_dir = DATA_DIR / "ipc" / state.group_folder / "input"
-        try:
-            input_dir.mkdir(parents=True, exist_ok=True)
-            filename = f"{int(time.time() * 1000)}-{os.urandom(3).hex()}.json"
-            filepath = input_dir / filename
-            temp_path = filepath.with_suffix(".json.tmp")
-            temp_path.write_text(json.dumps({"type": "message", "text": text}))
-            temp_path.rename(filepath)
-            return True
-        except Exception:
-            return False
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_ipc_writer, _write_ipc_message, input_dir, text)
 
     def close_stdin(self, chat_id: str) -> None:
-        """Signal the active container to wind down via a close sentinel."""
+        """Signal the active container to wind down via a close sentinel.
+
+        Synchronous so it can be used as a timer callback; the sentinel is
+        written on the IPC writer thread, after any message already sent.
+        """
         state = self._get_group(chat_id)
         if not state.active or not state.group_folder:
             return
 
         input_dir = DATA_DIR / "ipc" / state.group_folder / "input"
-        try:
-            input_dir.mkdir(parents=True, exist_ok=True)
-            (input_dir / "_close").write_text("")
-        except Exception:
-            pass
+        asyncio.get_running_loop().run_in_executor(_ipc_writer, _write_close_sentinel, input_dir)
 
-    async def _run_for_group(self, chat_id: str, reason: str) -> None:
-        """Execute the process-messages function for a group."""
-        state = self._get_group(chat_id)
+    def _start_messages(self, chat_id: str, state: _GroupState, reason: str) -> None:
+        """Claim a container slot for the group now, then run its message check.
+
+        Claiming synchronously (rather than when the task first runs) keeps
+        back-to-back dispatches from overshooting the concurrency limit or
+        starting two containers for one group.
+        """
         state.active = True
         state.pending_messages = False
         self._active_count += 1
+        asyncio.create_task(self._run_for_group(chat_id, reason))
 
-        logger.debug(
+    def _start_task(self, chat_id: str, state: _GroupState, task: _QueuedTask) -> None:
+        """Claim a container slot for the group now, then run *task*."""
+        state.active = True
+        self._active_count += 1
+        asyncio.create_task(self._run_task(chat_id, task))
+
+    async def _run_for_group(self, chat_id: str, reason: str) -> None:
+        """Execute the process-messages function for a group (slot already held)."""
+        state = self._get_group(chat_id)
+
+        state.log.debug(
             "Starting container for group",
-            chat_id=chat_id,
             reason=reason,
             active_count=self._active_count,
         )
@@ -206,25 +304,17 @@ class GroupQueue:
                 else:
                     self._schedule_retry(chat_id, state)
         except Exception as err:
-            logger.error("Error processing messages for group", chat_id=chat_id, error=str(err))
+            state.log.error("Error processing messages for group", error=str(err))
             self._schedule_retry(chat_id, state)
         finally:
-            state.active = False
-            state.process = None
-            state.container_name = None
-            state.group_folder = None
-            self._active_count -= 1
-            self._drain_group(chat_id)
+            self._finish_group(chat_id, state)
 
     async def _run_task(self, chat_id: str, task: _QueuedTask) -> None:
-        """Execute a queued task."""
+        """Execute a queued task (slot already held)."""
         state = self._get_group(chat_id)
-        state.active = True
-        self._active_count += 1
 
-        logger.debug(
+        state.log.debug(
             "Running queued task",
-            chat_id=chat_id,
             task_id=task.id,
             active_count=self._active_count,
         )
@@ -232,32 +322,32 @@ class GroupQueue:
         try:
             await task.fn()
         except Exception as err:
-            logger.error("Error running task", chat_id=chat_id, task_id=task.id, error=str(err))
+            state.log.error("Error running task", task_id=task.id, error=str(err))
         finally:
-            state.active = False
-            state.process = None
-            state.container_name = None
-            state.group_folder = None
-            self._active_count -= 1
-            self._drain_group(chat_id)
+            self._finish_group(chat_id, state)
 
     def _schedule_retry(self, chat_id: str, state: _GroupState) -> None:
-        """Schedule a retry with exponential backoff."""
+        """Schedule a retry with jittered exponential backoff.
+
+        The delay is drawn from the upper half of the capped backoff so
+        groups that failed together don't retry in lockstep.
+        """
         state.retry_count += 1
         if state.retry_count > MAX_RETRIES:
-            logger.error(
+            state.log.error(
                 "Max retries exceeded, dropping messages",
-                chat_id=chat_id,
                 retry_count=state.retry_count,
             )
             state.retry_count = 0
             return
 
-        delay = BASE_RETRY_SECONDS * (2 ** (state.retry_count - 1))
-        logger.info(
+        base = BASE_RETRY_SECONDS * (2 ** (state.retry_count - 1))
+        cap = min(base, MAX_RETRY_DELAY_SECONDS)
+        delay = _rng.uniform(cap * 0.5, cap)
+        state.log.info(
             "Scheduling retry with backoff",
-            chat_id=chat_id,
             retry_count=state.retry_count,
+            base_seconds=base,
             delay_seconds=delay,
         )
 
@@ -268,6 +358,12 @@ class GroupQueue:
 
         asyncio.create_task(_retry())
 
+    def _finish_group(self, chat_id: str, state: _GroupState) -> None:
+        """Release a finished run's slot and start whatever is queued next."""
+        state.reset()
+        self._active_count -= 1
+        self._drain_group(chat_id)
+
     def _drain_group(self, chat_id: str) -> None:
         """Check for pending work after a group finishes."""
         if self._shutting_down:
@@ -275,31 +371,31 @@ class GroupQueue:
 
         state = self._get_group(chat_id)
 
-        # Tasks first (they won't be re-discovered from DB like messages)
-        if state.pending_tasks:
-            task = state.pending_tasks.pop(0)
-            asyncio.create_task(self._run_task(chat_id, task))
-            return
-
-        # Then pending messages
-        if state.pending_messages:
-            asyncio.create_task(self._run_for_group(chat_id, "drain"))
-            return
-
-        # Check waiting groups
+        # The group's own pending work competes for the freed slot through
+        # the weighted heap, so a busy group cannot hold on to its slot
+        # while other groups wait
+        if state.pending_tasks or state.pending_messages:
+            self._add_waiting(chat_id, state)
         self._drain_waiting()
 
     def _drain_waiting(self) -> None:
         """Start work for groups waiting for a concurrency slot."""
-        while self._waiting and self._active_count < MAX_CONCURRENT_CONTAINERS:
-            next_id = self._waiting.pop(0)
+        while self._waiting and self._active_count < self._max_concurrent:
+            vtime, _seq, next_id = heapq.heappop(self._waiting)
+            self._waiting_ids.discard(next_id)
+            self._vclock = vtime
             state = self._get_group(next_id)
+            if state.active:
+                # Started directly by an enqueue since it was queued; it
+                # picks up the rest of its work when that run finishes
+                continue
+            state.vtime += 1.0 / state.weight
 
+            # Tasks first (they won't be re-discovered from DB like messages)
             if state.pending_tasks:
-                task = state.pending_tasks.pop(0)
-                asyncio.create_task(self._run_task(next_id, task))
+                self._start_task(next_id, state, state.pop_task())
             elif state.pending_messages:
-                asyncio.create_task(self._run_for_group(next_id, "drain"))
+                self._start_messages(next_id, state, "drain")
 
     async def shutdown(self, grace_period_seconds: float = 5.0) -> None:
         """Shut down the queue, detaching active containers."""
@@ -10,24 +10,28 @@ All `chatJid` / `jid` references replaced with `chat_id` for Telegram.
 from __future__ import annotations
 
 import asyncio
-import json
-import time
-import uuid
-from datetime import datetime, timezone
+import os
+import random
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Callable, Awaitable, Protocol
 
-from croniter import croniter
+import orjson
+from croniter import CroniterError
+from watchfiles import Change, awatch
 
 from .config import (
     ASSISTANT_NAME,
     DATA_DIR,
+    IPC_MAX_PARALLEL,
     IPC_POLL_INTERVAL,
     MAIN_GROUP_FOLDER,
     TIMEZONE,
 )
+from .cron import next_cron_run
 from .db import create_task, delete_task, get_task_by_id, update_task
 from .logger import logger
+from .task_scheduler import wake_scheduler
 from .types import AvailableGroup, RegisteredGroup, ScheduledTask
 
 
@@ -40,7 +44,8 @@ class IpcDeps(Protocol):
 
     def register_group(self, chat_id: str, group: RegisteredGroup) -> None: ...
 
-    async def sync_group_metadata(self, force: bool) -> None: ...
+    # Returns None when the channel has nothing to sync (nothing to await)
+    def sync_group_metadata(self, force: bool) -> Awaitable[None] | None: ...
 
     def get_available_groups(self) -> list[AvailableGroup]: ...
 
@@ -54,6 +59,17 @@ class IpcDeps(Protocol):
 
 
 _ipc_watcher_running = False
+_ipc_stop_event: asyncio.Event | None = None
+_IPC_RESCAN_MS = 60_000
+
+# IPC base dir -> its errors/ directory, once created by this process
+_error_dirs: dict[Path, Path] = {}
+
+# (IPC base dir, group folder) -> (messages dir, tasks dir)
+_group_paths: dict[tuple[Path, str], tuple[Path, Path]] = {}
+
+# Task id suffixes only need to be unique within a millisecond
+_rng = random.Random(os.urandom(16))
 
 
 async def start_ipc_watcher(deps: IpcDeps) -> None:
@@ -70,6 +86,12 @@ async def start_ipc_watcher(deps: IpcDeps) -> None:
 
     logger.info("IPC watcher started (per-group namespaces)")
 
+    try:
+        await _watch_ipc_files(ipc_base_dir, deps)
+        return
+    except Exception as err:
+        logger.warning("IPC file watching failed, falling back to polling", error=str(err))
+
     while _ipc_watcher_running:
         try:
             await _process_ipc_files(ipc_base_dir, deps)
@@ -79,106 +101,209 @@ async def start_ipc_watcher(deps: IpcDeps) -> None:
         await asyncio.sleep(IPC_POLL_INTERVAL)
 
 
+async def _watch_ipc_files(ipc_base_dir: Path, deps: IpcDeps) -> None:
+    """Process IPC files as filesystem events arrive, per changed group.
+
+    A full scan runs at startup and whenever no event has arrived for
+    _IPC_RESCAN_MS, catching files written before the watch began or left
+    behind by a failed pass.
+    """
+    global _ipc_stop_event
+
+    _ipc_stop_event = asyncio.Event()
+    await _process_ipc_files(ipc_base_dir, deps)
+    async for changes in awatch(
+        ipc_base_dir,
+        watch_filter=_is_new_ipc_file,
+        stop_event=_ipc_stop_event,
+        rust_timeout=_IPC_RESCAN_MS,
+        yield_on_timeout=True,
+    ):
+        dirty = {
+            os.path.relpath(path, ipc_base_dir).split(os.sep, 1)[0]
+            for _change, path in changes
+        }
+        try:
+            await _process_ipc_files(ipc_base_dir, deps, dirty or None)
+        except Exception as err:
+            logger.error("Error in IPC watcher loop", error=str(err))
+
+
+def _is_new_ipc_file(change: Change, path: str) -> bool:
+    return change != Change.deleted and path.endswith(".json")
+
+
 def stop_ipc_watcher() -> None:
     """Signal the IPC watcher to stop."""
     global _ipc_watcher_running
     _ipc_watcher_running = False
+    if _ipc_stop_event is not None:
+        _ipc_stop_event.set()
+
 
+async def _process_ipc_files(
+    ipc_base_dir: Path,
+    deps: IpcDeps,
+    only: set[str] | None = None,
+) -> None:
+    """Process pending IPC files across group directories.
 
-async def _process_ipc_files(ipc_base_dir: Path, deps: IpcDeps) -> None:
-    """Process all pending IPC files across group directories."""
+    *only* restricts the pass to the named group folders.
+    """
     try:
         group_folders = [
             d.name
             for d in ipc_base_dir.iterdir()
-            if d.is_dir() and d.name != "errors"
+            if d.is_dir() and d.name != "errors" and (only is None or d.name in only)
         ]
     except Exception as err:
         logger.error("Error reading IPC base directory", error=str(err))
         return
 
+    if only is None:
+        # Forget the paths of group folders that have gone away
+        present = set(group_folders)
+        for key in [k for k in _group_paths if k[0] == ipc_base_dir and k[1] not in present]:
+            del _group_paths[key]
+
     registered_groups = deps.registered_groups()
 
-    for source_group in group_folders:
-        is_main = source_group == MAIN_GROUP_FOLDER
-        messages_dir = ipc_base_dir / source_group / "messages"
-        tasks_dir = ipc_base_dir / source_group / "tasks"
+    semaphore = asyncio.Semaphore(IPC_MAX_PARALLEL)
+
+    async def process(source_group: str) -> None:
+        async with semaphore:
+            await _process_group_files(ipc_base_dir, source_group, registered_groups, deps)
+
+    # Groups are independent, so their files are drained concurrently;
+    # files within a group keep their order.
+    results = await asyncio.gather(
+        *(process(g) for g in group_folders), return_exceptions=True
+    )
+    for source_group, result in zip(group_folders, results):
+        if isinstance(result, Exception):
+            logger.error(
+                "Error processing IPC files for group",
+                source_group=source_group,
+                error=str(result),
+            )
+
+
+async def _process_group_files(
+    ipc_base_dir: Path,
+    source_group: str,
+    registered_groups: dict[str, RegisteredGroup],
+    deps: IpcDeps,
+) -> None:
+    """Process one group's pending message and task files, oldest first.
+
+    Each file is deleted as soon as it is handled, before the next await, so
+    a cancelled or crashed pass never replays a sent message or re-creates
+    a task.
+    """
+    is_main = source_group == MAIN_GROUP_FOLDER
+    messages_dir, tasks_dir = _group_dirs(ipc_base_dir, source_group)
 
-        # Process messages
-        if messages_dir.exists():
+    # Process messages
+    try:
+        for name in _list_json_files(messages_dir):
+            file_path = messages_dir / name
             try:
-                for file_path in sorted(messages_dir.glob("*.json")):
-                    try:
-                        data = json.loads(file_path.read_text())
-                        if data.get("type") == "message" and data.get("chatId") and data.get("text"):
-                            target_chat_id = data["chatId"]
-                            target_group = registered_groups.get(target_chat_id)
-
-                            # Authorization check
-                            if is_main or (target_group and target_group.folder == source_group):
-                                await deps.send_message(
-                                    target_chat_id,
-                                    f"{ASSISTANT_NAME}: {data['text']}",
-                                )
-                                logger.info(
-                                    "IPC message sent",
-                                    chat_id=target_chat_id,
-                                    source_group=source_group,
-                                )
-                            else:
-                                logger.warning(
-                                    "Unauthorized IPC message attempt blocked",
-                                    chat_id=target_chat_id,
-                                    source_group=source_group,
-                                )
-                        file_path.unlink()
-                    except Exception as err:
-                        logger.error(
-                            "Error processing IPC message",
-                            file=file_path.name,
+                data = orjson.loads(file_path.read_bytes())
+                if data.get("type") == "message" and data.get("chatId") and data.get("text"):
+                    target_chat_id = data["chatId"]
+                    target_group = registered_groups.get(target_chat_id)
+
+                    # Authorization check
+                    if is_main or (target_group and target_group.folder == source_group):
+                        await deps.send_message(
+                            target_chat_id,
+                            f"{ASSISTANT_NAME}: {data['text']}",
+                        )
+                        logger.info(
+                            "IPC message sent",
+                            chat_id=target_chat_id,
+                            source_group=source_group,
+                        )
+                    else:
+                        logger.warning(
+                            "Unauthorized IPC message attempt blocked",
+                            chat_id=target_chat_id,
                             source_group=source_group,
-                            error=str(err),
                         )
-                        _move_to_errors(file_path, ipc_base_dir, source_group)
+                file_path.unlink()
             except Exception as err:
                 logger.error(
-                    "Error reading IPC messages directory",
+                    "Error processing IPC message",
+                    file=file_path.name,
                     source_group=source_group,
                     error=str(err),
                 )
+                _move_to_errors(file_path, ipc_base_dir, source_group)
+    except Exception as err:
+        logger.error(
+            "Error reading IPC messages directory",
+            source_group=source_group,
+            error=str(err),
+        )
 
-        # Process tasks
-        if tasks_dir.exists():
+    # Process tasks
+    try:
+        for name in _list_json_files(tasks_dir):
+            file_path = tasks_dir / name
             try:
-                for file_path in sorted(tasks_dir.glob("*.json")):
-                    try:
-                        data = json.loads(file_path.read_text())
-                        await process_task_ipc(data, source_group, is_main, deps)
-                        file_path.unlink()
-                    except Exception as err:
-                        logger.error(
-                            "Error processing IPC task",
-                            file=file_path.name,
-                            source_group=source_group,
-                            error=str(err),
-                        )
-                        _move_to_errors(file_path, ipc_base_dir, source_group)
+                data = orjson.loads(file_path.read_bytes())
+                await process_task_ipc(data, source_group, is_main, deps)
+                file_path.unlink()
             except Exception as err:
                 logger.error(
-                    "Error reading IPC tasks directory",
+                    "Error processing IPC task",
+                    file=file_path.name,
                     source_group=source_group,
                     error=str(err),
                 )
+                _move_to_errors(file_path, ipc_base_dir, source_group)
+    except Exception as err:
+        logger.error(
+            "Error reading IPC tasks directory",
+            source_group=source_group,
+            error=str(err),
+        )
+
+
+def _group_dirs(ipc_base_dir: Path, source_group: str) -> tuple[Path, Path]:
+    """The (messages, tasks) directories for a group, built once per group."""
+    key = (ipc_base_dir, source_group)
+    dirs = _group_paths.get(key)
+    if dirs is None:
+        group_dir = ipc_base_dir / source_group
+        dirs = _group_paths[key] = (group_dir / "messages", group_dir / "tasks")
+    return dirs
+
+
+def _list_json_files(directory: Path) -> list[str]:
+    """Sorted names of the regular *.json files in *directory* (none if missing)."""
+    try:
+        with os.scandir(directory) as it:
+            return sorted(
+                entry.name
+                for entry in it
+                if entry.name.endswith(".json") and entry.is_file(follow_symlinks=False)
+            )
+    except FileNotFoundError:
+        return []
 
 
 def _move_to_errors(file_path: Path, ipc_base_dir: Path, source_group: str) -> None:
     """Move a failed IPC file to the errors directory."""
-    error_dir = ipc_base_dir / "errors"
-    error_dir.mkdir(parents=True, exist_ok=True)
+    error_dir = _error_dirs.get(ipc_base_dir)
+    if error_dir is None:
+        error_dir = ipc_base_dir / "errors"
+        error_dir.mkdir(parents=True, exist_ok=True)
+        _error_dirs[ipc_base_dir] = error_dir
     try:
-        file_path.rename(error_dir / f"{source_group}-{file_path.name}")
+        os.replace(file_path, error_dir / f"{source_group}-{file_path.name}")
     except Exception:
-        pass
+        _error_dirs.pop(ipc_base_dir, None)
 
 
 async def process_task_ipc(
@@ -192,173 +317,236 @@ async def process_task_ipc(
     Handles: schedule_task, pause_task, resume_task, cancel_task,
              refresh_groups, register_group.
     """
-    registered_groups = deps.registered_groups()
     task_type = data.get("type", "")
+    handler = _TASK_HANDLERS.get(task_type)
+    if handler is None:
+        logger.warning("Unknown IPC task type", type=task_type)
+        return
 
-    if task_type == "schedule_task":
-        prompt = data.get("prompt")
-        schedule_type = data.get("schedule_type")
-        schedule_value = data.get("schedule_value")
-        target_chat_id = data.get("targetChatId") or data.get("targetJid")
+    missing = [key for key in _REQUIRED_FIELDS.get(task_type, ()) if not data.get(key)]
+    if missing:
+        logger.warning(
+            "Invalid IPC task — missing required fields",
+            type=task_type,
+            missing=missing,
+            source_group=source_group,
+        )
+        return
 
-        if not all([prompt, schedule_type, schedule_value, target_chat_id]):
-            return
+    await handler(data, source_group, is_main, deps)
 
-        target_group = registered_groups.get(target_chat_id)
-        if not target_group:
-            logger.warning(
-                "Cannot schedule task: target group not registered",
-                target_chat_id=target_chat_id,
-            )
-            return
 
-        # Authorization: non-main can only schedule for themselves
-        if not is_main and target_group.folder != source_group:
-            logger.warning(
-                "Unauthorized schedule_task attempt blocked",
-                source_group=source_group,
-                target_folder=target_group.folder,
-            )
-            return
+_TaskHandler = Callable[[dict[str, Any], str, bool, IpcDeps], Awaitable[None]]
 
-        # Calculate next_run
-        next_run: str | None = None
-        if schedule_type == "cron":
-            try:
-                cron = croniter(schedule_value)
-                next_run = datetime.fromtimestamp(
-                    cron.get_next(float), tz=timezone.utc
-                ).isoformat()
-            except (ValueError, KeyError):
-                logger.warning("Invalid cron expression", schedule_value=schedule_value)
-                return
-        elif schedule_type == "interval":
-            ms = int(schedule_value)
-            if ms <= 0:
-                logger.warning("Invalid interval", schedule_value=schedule_value)
-                return
-            next_run = datetime.fromtimestamp(
-                time.time() + ms / 1000, tz=timezone.utc
-            ).isoformat()
-        elif schedule_type == "once":
-            try:
-                scheduled = datetime.fromisoformat(schedule_value)
-                next_run = scheduled.isoformat()
-            except ValueError:
-                logger.warning("Invalid timestamp", schedule_value=schedule_value)
-                return
-
-        task_id = f"task-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
-        context_mode = data.get("context_mode", "isolated")
-        if context_mode not in ("group", "isolated"):
-            context_mode = "isolated"
-
-        create_task(
-            ScheduledTask(
-                id=task_id,
-                group_folder=target_group.folder,
-                chat_id=target_chat_id,
-                prompt=prompt,
-                schedule_type=schedule_type,
-                schedule_value=schedule_value,
-                context_mode=context_mode,
-                next_run=next_run,
-                status="active",
-                created_at=datetime.now(timezone.utc).isoformat(),
-            )
+
+async def _handle_schedule_task(
+    data: dict[str, Any],
+    source_group: str,
+    is_main: bool,
+    deps: IpcDeps,
+) -> None:
+    prompt = data["prompt"]
+    schedule_type = data["schedule_type"]
+    schedule_value = data["schedule_value"]
+    target_chat_id = data.get("targetChatId") or data.get("targetJid")
+    if not target_chat_id:
+        return
+
+    target_group = deps.registered_groups().get(target_chat_id)
+    if not target_group:
+        logger.warning(
+            "Cannot schedule task: target group not registered",
+            target_chat_id=target_chat_id,
         )
-        logger.info(
-            "Task created via IPC",
-            task_id=task_id,
+        return
+
+    # Authorization: non-main can only schedule for themselves
+    if not is_main and target_group.folder != source_group:
+        logger.warning(
+            "Unauthorized schedule_task attempt blocked",
             source_group=source_group,
             target_folder=target_group.folder,
+        )
+        return
+
+    # Calculate next_run
+    next_run_fn = _NEXT_RUN.get(schedule_type)
+    if next_run_fn is None:
+        logger.warning("Unknown schedule type", schedule_type=schedule_type)
+        return
+    now = datetime.now(timezone.utc)
+    next_run = next_run_fn(schedule_value, now)
+    if next_run is None:
+        return
+
+    task_id = f"task-{int(now.timestamp() * 1000)}-{_rng.getrandbits(32):08x}"
+    context_mode = data.get("context_mode", "isolated")
+    if context_mode not in ("group", "isolated"):
+        context_mode = "isolated"
+
+    create_task(
+        ScheduledTask(
+            id=task_id,
+            group_folder=target_group.folder,
+            chat_id=target_chat_id,
+            prompt=prompt,
+            schedule_type=schedule_type,
+            schedule_value=schedule_value,
             context_mode=context_mode,
+            next_run=next_run,
+            status="active",
+            created_at=now.isoformat(),
         )
+    )
+    wake_scheduler()
+    logger.info(
+        "Task created via IPC",
+        task_id=task_id,
+        source_group=source_group,
+        target_folder=target_group.folder,
+        context_mode=context_mode,
+    )
+
+
+def _next_run_cron(schedule_value: str, now: datetime) -> str | None:
+    try:
+        return next_cron_run(schedule_value, now.timestamp())
+    except CroniterError:
+        logger.warning("Invalid cron expression", schedule_value=schedule_value)
+        return None
 
-    elif task_type == "pause_task":
-        task_id = data.get("taskId")
-        if task_id:
-            task = get_task_by_id(task_id)
-            if task and (is_main or task.group_folder == source_group):
-                update_task(task_id, status="paused")
-                logger.info("Task paused via IPC", task_id=task_id, source_group=source_group)
-            else:
-                logger.warning(
-                    "Unauthorized task pause attempt",
-                    task_id=task_id,
-                    source_group=source_group,
-                )
 
-    elif task_type == "resume_task":
-        task_id = data.get("taskId")
-        if task_id:
-            task = get_task_by_id(task_id)
-            if task and (is_main or task.group_folder == source_group):
-                update_task(task_id, status="active")
-                logger.info("Task resumed via IPC", task_id=task_id, source_group=source_group)
-            else:
-                logger.warning(
-                    "Unauthorized task resume attempt",
-                    task_id=task_id,
-                    source_group=source_group,
-                )
+def _next_run_interval(schedule_value: str, now: datetime) -> str | None:
+    ms = int(schedule_value)
+    if ms <= 0:
+        logger.warning("Invalid interval", schedule_value=schedule_value)
+        return None
+    return (now + timedelta(milliseconds=ms)).isoformat()
 
-    elif task_type == "cancel_task":
-        task_id = data.get("taskId")
-        if task_id:
-            task = get_task_by_id(task_id)
-            if task and (is_main or task.group_folder == source_group):
-                delete_task(task_id)
-                logger.info("Task cancelled via IPC", task_id=task_id, source_group=source_group)
-            else:
-                logger.warning(
-                    "Unauthorized task cancel attempt",
-                    task_id=task_id,
-                    source_group=source_group,
-                )
 
-    elif task_type == "refresh_groups":
-        if is_main:
-            logger.info("Group metadata refresh requested via IPC", source_group=source_group)
-            await deps.sync_group_metadata(True)
-            available_groups = deps.get_available_groups()
-            deps.write_groups_snapshot(
-                source_group,
-                True,
-                available_groups,
-                set(registered_groups.keys()),
-            )
+def _next_run_once(schedule_value: str, now: datetime) -> str | None:
+    try:
+        return datetime.fromisoformat(schedule_value).isoformat()
+    except ValueError:
+        logger.warning("Invalid timestamp", schedule_value=schedule_value)
+        return None
+
+
+# First run of a new task per schedule_type; None means the value is invalid
+_NEXT_RUN: dict[str, Callable[[str, datetime], str | None]] = {
+    "cron": _next_run_cron,
+    "interval": _next_run_interval,
+    "once": _next_run_once,
+}
+
+
+def _task_status_handler(
+    apply: Callable[[str], None],
+    done: str,
+    attempt: str,
+) -> _TaskHandler:
+    """Build a pause/resume/cancel handler; they differ only in the update."""
+
+    async def handler(
+        data: dict[str, Any],
+        source_group: str,
+        is_main: bool,
+        deps: IpcDeps,
+    ) -> None:
+        task_id = data["taskId"]
+        task = get_task_by_id(task_id)
+        if task and (is_main or task.group_folder == source_group):
+            apply(task_id)
+            wake_scheduler()
+            logger.info(f"Task {done} via IPC", task_id=task_id, source_group=source_group)
         else:
             logger.warning(
-                "Unauthorized refresh_groups attempt blocked",
+                f"Unauthorized task {attempt} attempt",
+                task_id=task_id,
                 source_group=source_group,
             )
 
-    elif task_type == "register_group":
-        if not is_main:
-            logger.warning(
-                "Unauthorized register_group attempt blocked",
-                source_group=source_group,
-            )
-            return
-
-        chat_id = data.get("chatId") or data.get("jid")
-        name = data.get("name")
-        folder = data.get("folder")
-        trigger = data.get("trigger")
-
-        if all([chat_id, name, folder, trigger]):
-            deps.register_group(
-                chat_id,
-                RegisteredGroup(
-                    name=name,
-                    folder=folder,
-                    trigger=trigger,
-                    added_at=datetime.now(timezone.utc).isoformat(),
-                ),
-            )
-        else:
-            logger.warning("Invalid register_group request — missing required fields", data=data)
+    return handler
 
+
+async def _handle_refresh_groups(
+    data: dict[str, Any],
+    source_group: str,
+    is_main: bool,
+    deps: IpcDeps,
+) -> None:
+    if not is_main:
+        logger.warning(
+            "Unauthorized refresh_groups attempt blocked",
+            source_group=source_group,
+        )
+        return
+
+    logger.info("Group metadata refresh requested via IPC", source_group=source_group)
+    pending = deps.sync_group_metadata(True)
+    if pending is not None:
+        await pending
+    available_groups = deps.get_available_groups()
+    deps.write_groups_snapshot(
+        source_group,
+        True,
+        available_groups,
+        set(deps.registered_groups().keys()),
+    )
+
+
+async def _handle_register_group(
+    data: dict[str, Any],
+    source_group: str,
+    is_main: bool,
+    deps: IpcDeps,
+) -> None:
+    if not is_main:
+        logger.warning(
+            "Unauthorized register_group attempt blocked",
+            source_group=source_group,
+        )
+        return
+
+    chat_id = data.get("chatId") or data.get("jid")
+    name = data.get("name")
+    folder = data.get("folder")
+    trigger = data.get("trigger")
+
+    if all([chat_id, name, folder, trigger]):
+        deps.register_group(
+            chat_id,
+            RegisteredGroup(
+                name=name,
+                folder=folder,
+                trigger=trigger,
+                added_at=datetime.now(timezone.utc).isoformat(),
+            ),
+        )
     else:
-        logger.warning("Unknown IPC task type", type=task_type)
+        logger.warning("Invalid register_group request — missing required fields", data=data)
+
+
+# Fields each task type needs to be non-empty, checked before dispatch.
+# register_group is absent: its authorization check comes first.
+_REQUIRED_FIELDS: dict[str, tuple[str, ...]] = {
+    "schedule_task": ("prompt", "schedule_type", "schedule_value"),
+    "pause_task": ("taskId",),
+    "resume_task": ("taskId",),
+    "cancel_task": ("taskId",),
+}
+
+_TASK_HANDLERS: dict[str, _TaskHandler] = {
+    "schedule_task": _handle_schedule_task,
+    "pause_task": _task_status_handler(
+        lambda task_id: update_task(task_id, status="paused"), "paused", "pause"
+    ),
+    "resume_task": _task_status_handler(
+        lambda task_id: update_task(task_id, status="active"), "resumed", "resume"
+    ),
+    "cancel_task": _task_status_handler(
+        lambda task_id: delete_task(task_id), "cancelled", "cancel"
+    ),
+    "refresh_groups": _handle_refresh_groups,
+    "register_group": _handle_register_group,
+}
@@ -10,18 +10,27 @@ Port of src/mount-security.ts (419 lines).
 
 from __future__ import annotations
 
+import functools
 import json
 import os
+import re
 from pathlib import Path
 
-from .config import MOUNT_ALLOWLIST_PATH
+import orjson
+
+from .config import HOME_DIR, MOUNT_ALLOWLIST_PATH
 from .logger import logger
 from .types import AdditionalMount, AllowedRoot, MountAllowlist
 
-# Cache the allowlist in memory — only reloads on process restart
-_cached_allowlist: MountAllowlist | None = None
+# Cache the allowlist in memory, keyed by the file's (mtime_ns, size) so an
+# edited file is reloaded on the next call. None as the key means "missing";
+# None as the allowlist means the file at that key failed to load.
+_cached_allowlist: tuple[tuple[int, int] | None, MountAllowlist | None] | None = None
 _allowlist_load_error: str | None = None
 
+# Linux-only open flag that resolves a path without opening it for I/O
+_O_PATH: int | None = getattr(os, "O_PATH", None)
+
 # Default blocked patterns — paths that should never be mounted
 DEFAULT_BLOCKED_PATTERNS: list[str] = [
     ".ssh",
@@ -48,18 +57,26 @@ def load_mount_allowlist() -> MountAllowlist | None:
     """Load the mount allowlist from the external config location.
 
     Returns None if the file doesn't exist or is invalid.
-    Result is cached in memory for the lifetime of the process.
+    The result is cached until the file's mtime or size changes, so each
+    call costs one stat while the file is unchanged.
     """
     global _cached_allowlist, _allowlist_load_error
 
-    if _cached_allowlist is not None:
-        return _cached_allowlist
+    try:
+        st = MOUNT_ALLOWLIST_PATH.stat()
+        key: tuple[int, int] | None = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        key = None
+    except OSError:
+        key = (-1, -1)  # unreadable; let the load below report it
 
-    if _allowlist_load_error is not None:
-        return None
+    if _cached_allowlist is not None and _cached_allowlist[0] == key:
+        return _cached_allowlist[1]
+
+    _cached_allowlist = (key, None)
 
     try:
-        if not MOUNT_ALLOWLIST_PATH.exists():
+        if key is None:
             _allowlist_load_error = f"Mount allowlist not found at {MOUNT_ALLOWLIST_PATH}"
             logger.warning(
                 "Mount allowlist not found — additional mounts will be BLOCKED. "
@@ -68,8 +85,7 @@ def load_mount_allowlist() -> MountAllowlist | None:
             )
             return None
 
-        content = MOUNT_ALLOWLIST_PATH.read_text()
-        raw = json.loads(content)
+        raw = orjson.loads(MOUNT_ALLOWLIST_PATH.read_bytes())
 
         # Convert camelCase JSON keys to snake_case for Pydantic
         if "allowedRoots" in raw:
@@ -87,18 +103,21 @@ def load_mount_allowlist() -> MountAllowlist | None:
 
         allowlist = MountAllowlist.model_validate(raw)
 
-        # Merge with default blocked patterns
-        merged = list(set(DEFAULT_BLOCKED_PATTERNS + allowlist.blocked_patterns))
-        allowlist.blocked_patterns = merged
+        # Merge with default blocked patterns, de-duplicated in a stable order
+        # so the compiled-pattern cache keys on the same tuple every load
+        allowlist.blocked_patterns = list(
+            dict.fromkeys([*DEFAULT_BLOCKED_PATTERNS, *allowlist.blocked_patterns])
+        )
 
-        _cached_allowlist = allowlist
+        _cached_allowlist = (key, allowlist)
+        _allowlist_load_error = None
         logger.info(
             "Mount allowlist loaded successfully",
             path=str(MOUNT_ALLOWLIST_PATH),
             allowed_roots=len(allowlist.allowed_roots),
             blocked_patterns=len(allowlist.blocked_patterns),
         )
-        return _cached_allowlist
+        return allowlist
 
     except Exception as err:
         _allowlist_load_error = str(err)
@@ -119,57 +138,78 @@ def _reset_cache() -> None:
 
 def _expand_path(p: str) -> Path:
     """Expand ~ to home directory and resolve to absolute path."""
-    home_dir = os.environ.get("HOME", "/home/user")
     if p.startswith("~/"):
-        return Path(home_dir) / p[2:]
+        return HOME_DIR / p[2:]
     if p == "~":
-        return Path(home_dir)
+        return HOME_DIR
     return Path(p).resolve()
 
 
 def _get_real_path(p: Path) -> Path | None:
     """Get the real path, resolving symlinks. Returns None if path doesn't exist."""
+    if _O_PATH is not None:
+        # Let the kernel resolve every component in one open() instead of
+        # lstat-ing each one; /proc reports the path it landed on
+        try:
+            fd = os.open(p, _O_PATH | os.O_CLOEXEC)
+        except (OSError, ValueError):
+            return None
+        try:
+            return Path(os.readlink(f"/proc/self/fd/{fd}"))
+        except OSError:
+            pass  # no /proc; fall back below
+        finally:
+            os.close(fd)
     try:
         return p.resolve(strict=True)
     except (OSError, ValueError):
         return None
 
 
-def _matches_blocked_pattern(real_path: str, blocked_patterns: list[str]) -> str | None:
-    """Check if a path matches any blocked pattern."""
-    path_parts = real_path.split(os.sep)
+@functools.lru_cache(maxsize=8)
+def _blocked_pattern_re(blocked_patterns: tuple[str, ...]) -> re.Pattern[str]:
+    """One alternation over all blocked patterns, longest first."""
+    ordered = sorted(blocked_patterns, key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, ordered)))
 
-    for pattern in blocked_patterns:
-        # Check if any path component matches the pattern
-        for part in path_parts:
-            if part == pattern or pattern in part:
-                return pattern
 
-        # Also check if the full path contains the pattern
-        if pattern in real_path:
-            return pattern
+def _matches_blocked_pattern(real_path: str, blocked_patterns: list[str]) -> str | None:
+    """Check if a path matches any blocked pattern.
 
-    return None
+    A pattern matches when it occurs anywhere in the path, which covers
+    both whole components and substrings of them.
+    """
+    if not blocked_patterns:
+        return None
+    match = _blocked_pattern_re(tuple(blocked_patterns)).search(real_path)
+    return match.group(0) if match else None
 
 
-def _find_allowed_root(
-    real_path: str,
-    allowed_roots: list[AllowedRoot],
-) -> AllowedRoot | None:
-    """Check if a real path is under an allowed root."""
-    for root in allowed_roots:
-        expanded_root = _expand_path(root.path)
-        real_root = _get_real_path(expanded_root)
+def _resolve_allowed_roots(allowed_roots: list[AllowedRoot]) -> list[tuple[AllowedRoot, str, str]]:
+    """Pair each allowed root with its real path, dropping roots that don't exist.
 
+    Each entry is (root, real_root, real_root with a trailing separator).
+    """
+    resolved: list[tuple[AllowedRoot, str, str]] = []
+    for root in allowed_roots:
+        real_root = _get_real_path(_expand_path(root.path))
         if real_root is None:
+            logger.warning("Allowed mount root does not exist — ignoring it", root=root.path)
             continue
+        real_root_str = str(real_root)
+        resolved.append((root, real_root_str, os.path.join(real_root_str, "")))
+    return resolved
 
-        # Check if real_path is under real_root
-        try:
-            Path(real_path).relative_to(real_root)
+
+def _find_allowed_root(
+    real_path: str,
+    resolved_roots: list[tuple[AllowedRoot, str, str]],
+) -> AllowedRoot | None:
+    """Check if a real path is under an allowed root (see _resolve_allowed_roots)."""
+    for root, real_root, prefix in resolved_roots:
+        # The separator on the prefix keeps /data from matching /database
+        if real_path == real_root or real_path.startswith(prefix):
             return root
-        except ValueError:
-            continue
 
     return None
 
@@ -188,6 +228,14 @@ def _is_valid_container_path(container_path: str) -> bool:
 class MountValidationResult:
     """Result of validating a single additional mount."""
 
+    __slots__ = (
+        "allowed",
+        "reason",
+        "real_host_path",
+        "resolved_container_path",
+        "effective_readonly",
+    )
+
     def __init__(
         self,
         allowed: bool,
@@ -203,8 +251,16 @@ class MountValidationResult:
         self.effective_readonly = effective_readonly
 
 
-def validate_mount(mount: AdditionalMount, is_main: bool) -> MountValidationResult:
-    """Validate a single additional mount against the allowlist."""
+def validate_mount(
+    mount: AdditionalMount,
+    is_main: bool,
+    resolved_roots: list[tuple[AllowedRoot, str, str]] | None = None,
+) -> MountValidationResult:
+    """Validate a single additional mount against the allowlist.
+
+    *resolved_roots* lets a caller validating several mounts resolve the
+    allowed roots once; by default they are resolved for this call.
+    """
     allowlist = load_mount_allowlist()
 
     if allowlist is None:
@@ -247,7 +303,9 @@ def validate_mount(mount: AdditionalMount, is_main: bool) -> MountValidationResu
         )
 
     # Check if under an allowed root
-    allowed_root = _find_allowed_root(real_path_str, allowlist.allowed_roots)
+    if resolved_roots is None:
+        resolved_roots = _resolve_allowed_roots(allowlist.allowed_roots)
+    allowed_root = _find_allowed_root(real_path_str, resolved_roots)
     if allowed_root is None:
         roots_str = ", ".join(str(_expand_path(r.path)) for r in allowlist.allowed_roots)
         return MountValidationResult(
@@ -284,6 +342,8 @@ def validate_mount(mount: AdditionalMount, is_main: bool) -> MountValidationResu
 class ValidatedMount:
     """A mount that has passed validation."""
 
+    __slots__ = ("host_path", "container_path", "readonly")
+
     def __init__(self, host_path: str, container_path: str, readonly: bool) -> None:
         self.host_path = host_path
         self.container_path = container_path
@@ -302,8 +362,15 @@ def validate_additional_mounts(
     """
     validated: list[ValidatedMount] = []
 
+    # Real paths are resolved per call, never cached across calls, so a
+    # retargeted root symlink or a newly created root is always seen
+    allowlist = load_mount_allowlist()
+    resolved_roots = (
+        _resolve_allowed_roots(allowlist.allowed_roots) if allowlist and mounts else None
+    )
+
     for mount in mounts:
-        result = validate_mount(mount, is_main)
+        result = validate_mount(mount, is_main, resolved_roots)
 
         if result.allowed:
             validated.append(
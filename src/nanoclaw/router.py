@@ -6,6 +6,7 @@ for agent input and outbound display.
 
 from __future__ import annotations
 
+from .config import TRIGGER_PATTERN, TRIGGER_PREFIX
 from .types import NewMessage
 
 
@@ -41,6 +42,35 @@ def format_messages(messages: list[NewMessage]) -> str:
     return "\n".join(parts)
 
 
+def _is_word_char(ch: str) -> bool:
+    """Whether *ch* counts as a word character for the regex word boundary."""
+    return ch.isalnum() or ch == "_"
+
+
+def has_trigger(messages: list[NewMessage]) -> bool:
+    """Return True if any message starts with the assistant trigger.
+
+    Equivalent to testing TRIGGER_PATTERN against each stripped message, but
+    compares a lowercased prefix and checks the word boundary by hand, which
+    avoids the regex engine entirely.
+    """
+    prefix = TRIGGER_PREFIX
+    if prefix is None:
+        return any(TRIGGER_PATTERN.match(m.content.lstrip()) for m in messages)
+
+    n = len(prefix)
+    prefix_ends_in_word = _is_word_char(prefix[-1])
+    for m in messages:
+        content = m.content.lstrip()
+        if content[:n].lower() != prefix:
+            continue
+        # \b: a word/non-word change between the prefix and what follows
+        next_is_word = len(content) > n and _is_word_char(content[n])
+        if next_is_word != prefix_ends_in_word:
+            return True
+    return False
+
+
 def format_outbound(text: str) -> str:
     """Format an outbound message from the bot.
 
@@ -8,12 +8,10 @@ from __future__ import annotations
 
 import asyncio
 import time
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any, Callable, Awaitable, Protocol
 
-from croniter import croniter
-
 from .config import (
     GROUPS_DIR,
     IDLE_TIMEOUT,
@@ -26,12 +24,14 @@ from .container_runner import (
     run_container_agent,
     write_tasks_snapshot,
 )
+from .cron import next_cron_run
 from .db import (
-    get_all_tasks,
+    finish_task_run,
     get_due_tasks,
+    get_next_run_after,
     get_task_by_id,
+    get_task_snapshot,
     log_task_run,
-    update_task_after_run,
 )
 from .group_queue import GroupQueue
 from .logger import logger
@@ -61,6 +61,19 @@ class SchedulerDeps(Protocol):
 
 async def _run_task(task: ScheduledTask, deps: SchedulerDeps) -> None:
     """Execute a single scheduled task in a container."""
+    # It may have been paused or cancelled while waiting in the queue
+    current = get_task_by_id(task.id)
+    if current is None or current.status != "active":
+        logger.info("Skipping task that is no longer active", task_id=task.id)
+        return
+    # A wake-up while a recurring task was running can queue it a second
+    # time; the finished run has moved next_run on, so skip the duplicate
+    now = datetime.now(timezone.utc).isoformat()
+    if current.next_run is None or current.next_run > now:
+        logger.info("Skipping task that is no longer due", task_id=task.id)
+        return
+    task = current
+
     start_time = time.time()
     group_dir = GROUPS_DIR / task.group_folder
     group_dir.mkdir(parents=True, exist_ok=True)
@@ -92,22 +105,11 @@ async def _run_task(task: ScheduledTask, deps: SchedulerDeps) -> None:
 
     # Update tasks snapshot
     is_main = task.group_folder == MAIN_GROUP_FOLDER
-    all_tasks = get_all_tasks()
-    write_tasks_snapshot(
+    await asyncio.to_thread(
+        write_tasks_snapshot,
         task.group_folder,
         is_main,
-        [
-            {
-                "id": t.id,
-                "groupFolder": t.group_folder,
-                "prompt": t.prompt,
-                "schedule_type": t.schedule_type,
-                "schedule_value": t.schedule_value,
-                "status": t.status,
-                "next_run": t.next_run,
-            }
-            for t in all_tasks
-        ],
+        get_task_snapshot(),
     )
 
     result: str | None = None
@@ -162,29 +164,28 @@ async def _run_task(task: ScheduledTask, deps: SchedulerDeps) -> None:
         error = str(err)
         logger.error("Task failed", task_id=task.id, error=error)
 
-    duration_ms = int((time.time() - start_time) * 1000)
-    log_task_run(
-        TaskRunLog(
-            id="",
-            task_id=task.id,
-            started_at=datetime.now(timezone.utc).isoformat(),
-            status="error" if error else "success",
-            error=error,
-        )
+    finished = datetime.now(timezone.utc)
+    duration_ms = int((finished.timestamp() - start_time) * 1000)
+    run_log = TaskRunLog(
+        id="",
+        task_id=task.id,
+        started_at=finished.isoformat(),
+        status="error" if error else "success",
+        error=error,
     )
 
     # Calculate next run
     next_run: str | None = None
     if task.schedule_type == "cron":
-        cron = croniter(task.schedule_value)
-        next_run = datetime.fromtimestamp(cron.get_next(float), tz=timezone.utc).isoformat()
+        next_run = next_cron_run(task.schedule_value, finished.timestamp())
     elif task.schedule_type == "interval":
         ms = int(task.schedule_value)
-        next_run = datetime.fromtimestamp(time.time() + ms / 1000, tz=timezone.utc).isoformat()
+        next_run = (finished + timedelta(milliseconds=ms)).isoformat()
     # 'once' tasks have no next run
 
     result_summary = f"Error: {error}" if error else (result[:200] if result else "Completed")
-    update_task_after_run(task.id, next_run, result_summary)
+    finish_task_run(task.id, next_run, result_summary, run_log)
+    wake_scheduler()
 
 
 def _make_on_output(
@@ -208,17 +209,55 @@ def _make_on_output(
 
 
 _scheduler_running = False
+_wake_event: asyncio.Event | None = None
+
+# Floor on a due-time sleep, so timestamps whose string order disagrees
+# with their time order (e.g. "...00Z" vs "...00.5+00:00") can't spin the loop
+_MIN_SLEEP = 1.0
+
+
+def wake_scheduler() -> None:
+    """Have the scheduler re-check due tasks now (call after changing a task)."""
+    if _wake_event is not None:
+        _wake_event.set()
+
+
+async def _sleep_until_next_due(wake: asyncio.Event) -> None:
+    """Sleep until the next task is due, a wake-up, or the poll interval."""
+    now = datetime.now(timezone.utc)
+    delay = SCHEDULER_POLL_INTERVAL
+    try:
+        next_run = get_next_run_after(now.isoformat())
+        if next_run is not None:
+            due = datetime.fromisoformat(next_run)
+            if due.tzinfo is None:
+                # Compared as UTC by get_due_tasks' string comparison
+                due = due.replace(tzinfo=timezone.utc)
+            delay = min(delay, max((due - now).total_seconds(), _MIN_SLEEP))
+    except Exception as err:
+        logger.error("Error computing next scheduler wake-up", error=str(err))
+
+    try:
+        await asyncio.wait_for(wake.wait(), timeout=delay)
+    except asyncio.TimeoutError:
+        pass
+    wake.clear()
 
 
 async def start_scheduler_loop(deps: SchedulerDeps) -> None:
-    """Start the scheduler poll loop (runs as an asyncio task)."""
-    global _scheduler_running
+    """Start the scheduler loop (runs as an asyncio task).
+
+    Instead of polling on a fixed interval, it sleeps until the earliest
+    future next_run, or until wake_scheduler() reports a task change.
+    """
+    global _scheduler_running, _wake_event
 
     if _scheduler_running:
         logger.debug("Scheduler loop already running, skipping duplicate start")
         return
 
     _scheduler_running = True
+    _wake_event = wake = asyncio.Event()
     logger.info("Scheduler loop started")
 
     while _scheduler_running:
@@ -227,24 +266,22 @@ async def start_scheduler_loop(deps: SchedulerDeps) -> None:
             if due_tasks:
                 logger.info("Found due tasks", count=len(due_tasks))
 
+            # get_due_tasks only returns active tasks; status is re-checked
+            # when a task actually starts, since it may wait in the queue
             for task in due_tasks:
-                # Re-check status
-                current = get_task_by_id(task.id)
-                if not current or current.status != "active":
-                    continue
-
                 deps.queue.enqueue_task(
-                    current.chat_id,
-                    current.id,
-                    lambda t=current: _run_task(t, deps),
+                    task.chat_id,
+                    task.id,
+                    lambda t=task: _run_task(t, deps),
                 )
         except Exception as err:
             logger.error("Error in scheduler loop", error=str(err))
 
-        await asyncio.sleep(SCHEDULER_POLL_INTERVAL)
+        await _sleep_until_next_due(wake)
 
 
 def stop_scheduler() -> None:
     """Signal the scheduler to stop."""
     global _scheduler_running
     _scheduler_running = False
+    wake_scheduler()
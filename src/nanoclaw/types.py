@@ -1,7 +1,12 @@
-"""Type definitions for NanoClaw — Pydantic models and Protocol classes."""
+"""Type definitions for NanoClaw — Pydantic models and Protocol classes.
+
+Records built on every message or container run from already-trusted data
+are slotted dataclasses instead, which skip validation entirely.
+"""
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Any, Protocol, runtime_checkable
 
 from pydantic import BaseModel
@@ -44,7 +49,8 @@ class Channel(Protocol):
 # Data models
 # ---------------------------------------------------------------------------
 
-class NewMessage(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class NewMessage:
     """A message received from the messaging platform."""
 
     id: str
@@ -130,7 +136,8 @@ class TaskRunLog(BaseModel):
     error: str | None = None
 
 
-class ContainerInput(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class ContainerInput:
     """Input data sent to the container agent via stdin."""
 
     prompt: str
@@ -141,7 +148,8 @@ class ContainerInput(BaseModel):
     is_scheduled_task: bool = False
 
 
-class ContainerOutput(BaseModel):
+@dataclass(slots=True, kw_only=True)
+class ContainerOutput:
     """Output data received from the container agent via stdout."""
 
     status: str  # 'success' | 'error'
@@ -6,10 +6,15 @@ Rather than mocking subprocess, tests the output parsing logic directly.
 
 from __future__ import annotations
 
+import asyncio
 import json
+import shutil
 
 import pytest
 
+import nanoclaw.container_runner as cr
+from nanoclaw.container_runner import _OutputStreamParser, _read_container_output
+
 
 OUTPUT_START_MARKER = "---NANOCLAW_OUTPUT_START---"
 OUTPUT_END_MARKER = "---NANOCLAW_OUTPUT_END---"
@@ -107,3 +112,139 @@ class TestContainerOutputParsing:
         results = parse_container_output(raw)
         assert len(results) == 1
         assert results[0]["result"] is None
+
+
+# ── _read_container_output ────────────────────────────────────
+
+
+class _FakeProc:
+    def __init__(self, stdout: str) -> None:
+        self.stdout = asyncio.StreamReader()
+        self.stdout.feed_data(stdout.encode())
+        self.stdout.feed_eof()
+
+
+class TestReadContainerOutput:
+    @pytest.mark.asyncio
+    async def test_structured_result_serialized_at_source(self):
+        stdout = (
+            f"{OUTPUT_START_MARKER}\n"
+            + json.dumps({"status": "success", "result": {"answer": 42}})
+            + f"\n{OUTPUT_END_MARKER}\n"
+        )
+        seen = []
+
+        async def on_output(output):
+            seen.append(output.result)
+
+        final = await _read_container_output(_FakeProc(stdout), on_output)
+        assert json.loads(final.result) == {"answer": 42}
+        assert seen == [final.result]
+
+    @pytest.mark.asyncio
+    async def test_string_result_passthrough(self):
+        stdout = (
+            f"{OUTPUT_START_MARKER}\n"
+            + json.dumps({"status": "success", "result": "hi"})
+            + f"\n{OUTPUT_END_MARKER}\n"
+        )
+        final = await _read_container_output(_FakeProc(stdout), None)
+        assert final.result == "hi"
+
+    @pytest.mark.asyncio
+    async def test_result_larger_than_stream_line_limit(self):
+        big = "x" * 200_000
+        stdout = (
+            f"{OUTPUT_START_MARKER}\n"
+            + json.dumps({"status": "success", "result": big})
+            + f"\n{OUTPUT_END_MARKER}\n"
+        )
+        final = await _read_container_output(_FakeProc(stdout), None)
+        assert final.result == big
+
+
+class TestOutputStreamParser:
+    def test_markers_split_across_chunks(self):
+        data = (
+            f"noise\n{OUTPUT_START_MARKER}\n"
+            + json.dumps({"status": "success", "result": "hi"})
+            + f"\n{OUTPUT_END_MARKER}"
+        ).encode()
+        parser = _OutputStreamParser(10_000)
+        outputs = []
+        for i in range(len(data)):
+            outputs += parser.feed(data[i:i + 1])
+        outputs += parser.finish()
+        assert [o.result for o in outputs] == ["hi"]
+
+    def test_oversized_block_is_dropped(self):
+        data = (
+            f"{OUTPUT_START_MARKER}\n"
+            + json.dumps({"status": "success", "result": "y" * 10_000})
+            + f"\n{OUTPUT_END_MARKER}\n"
+        ).encode()
+        parser = _OutputStreamParser(5_000)
+        assert parser.feed(data) + parser.finish() == []
+
+    def test_size_limit_counts_bytes_not_characters(self):
+        # 3000 two-byte characters: under the limit in code points, over it in bytes
+        data = (
+            f"{OUTPUT_START_MARKER}\n"
+            + json.dumps({"status": "success", "result": "é" * 3_000}, ensure_ascii=False)
+            + f"\n{OUTPUT_END_MARKER}\n"
+        ).encode()
+        parser = _OutputStreamParser(5_000)
+        assert parser.feed(data) + parser.finish() == []
+
+    def test_block_with_non_string_fields_is_dropped(self):
+        data = (
+            f"{OUTPUT_START_MARKER}\n"
+            + json.dumps({"status": 1, "result": "hi", "newSessionId": ["s"]})
+            + f"\n{OUTPUT_END_MARKER}\n"
+        ).encode()
+        parser = _OutputStreamParser(10_000)
+        assert parser.feed(data) + parser.finish() == []
+
+
+class TestEnsureContainerSystemRunning:
+    @pytest.fixture
+    def probes(self, monkeypatch):
+        results: list[bool] = []
+        calls: list[bool] = []
+
+        async def probe() -> bool:
+            calls.append(results[len(calls)])
+            return calls[-1]
+
+        monkeypatch.setattr(cr, "_probe_container_system", probe)
+        monkeypatch.setattr(cr, "_runtime_ok_at", None)
+        monkeypatch.setattr(cr, "_runtime_check_lock", None)
+        return results, calls
+
+    @pytest.mark.asyncio
+    async def test_success_is_cached(self, probes):
+        results, calls = probes
+        results.extend([True, False])
+        assert await cr.ensure_container_system_running()
+        assert await cr.ensure_container_system_running()
+        assert calls == [True]
+
+    @pytest.mark.asyncio
+    async def test_failure_is_not_cached(self, probes):
+        results, calls = probes
+        results.extend([False, True])
+        assert not await cr.ensure_container_system_running()
+        assert await cr.ensure_container_system_running()
+        assert calls == [False, True]
+
+
+class TestSnapshotDirectories:
+    def test_snapshot_recreates_removed_directory(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(cr, "DATA_DIR", tmp_path)
+        monkeypatch.setattr(cr, "_ensured_dirs", set())
+        cr.write_tasks_snapshot("group1", True, [])
+        shutil.rmtree(tmp_path / "ipc" / "group1")
+
+        cr.write_tasks_snapshot("group1", True, [{"id": "t1"}])
+        data = json.loads((tmp_path / "ipc" / "group1" / "tasks.json").read_text())
+        assert data == [{"id": "t1"}]
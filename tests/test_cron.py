@@ -0,0 +1,29 @@
+"""Tests for the shared cron helpers."""
+
+from __future__ import annotations
+
+import pytest
+from croniter import CroniterError
+
+from nanoclaw.cron import _parsed_cron, next_cron_run
+
+# 2024-01-01 00:00:00 UTC (a Monday)
+_T0 = 1704067200.0
+
+
+class TestNextCronRun:
+    def test_next_run_after_now(self):
+        assert next_cron_run("*/5 * * * *", _T0) == "2024-01-01T00:05:00+00:00"
+
+    def test_cached_parse_is_not_advanced(self):
+        later = _T0 + 86400
+        assert next_cron_run("0 9 * * *", later) == "2024-01-02T09:00:00+00:00"
+        # An earlier "now" must not inherit the previous call's position
+        assert next_cron_run("0 9 * * *", _T0) == "2024-01-01T09:00:00+00:00"
+        cur = _parsed_cron("0 9 * * *").cur
+        next_cron_run("0 9 * * *", later)
+        assert _parsed_cron("0 9 * * *").cur == cur
+
+    def test_invalid_expression_raises(self):
+        with pytest.raises(CroniterError):
+            next_cron_run("not a cron", _T0)
@@ -9,18 +9,28 @@ from __future__ import annotations
 import pytest
 
 from nanoclaw.db import (
+    _get_db,
     _init_test_database,
     create_task,
+    create_tasks,
     delete_task,
+    finish_task_run,
     get_all_chats,
     get_messages_since,
     get_new_messages,
+    get_next_run_after,
+    get_router_state,
     get_task_by_id,
+    get_task_snapshot,
+    set_router_state,
+    set_router_states,
     store_chat_metadata,
+    store_chats_metadata,
     store_message,
+    store_messages,
     update_task,
 )
-from nanoclaw.types import NewMessage, ScheduledTask
+from nanoclaw.types import NewMessage, ScheduledTask, TaskRunLog
 
 
 @pytest.fixture(autouse=True)
@@ -63,7 +73,7 @@ class TestStoreMessage:
             content="hello world",
             timestamp="2024-01-01T00:00:01.000Z",
         )
-        messages = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z", "BotName")
+        messages = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z")
         assert len(messages) == 1
         assert messages[0].id == "msg-1"
         assert messages[0].sender == "user-123"
@@ -80,7 +90,7 @@ class TestStoreMessage:
             content="",
             timestamp="2024-01-01T00:00:04.000Z",
         )
-        messages = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z", "BotName")
+        messages = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z")
         assert len(messages) == 1
         assert messages[0].content == ""
 
@@ -95,7 +105,7 @@ class TestStoreMessage:
             timestamp="2024-01-01T00:00:05.000Z",
             is_from_me=True,
         )
-        messages = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z", "BotName")
+        messages = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z")
         assert len(messages) == 1
 
     def test_upserts_on_duplicate(self):
@@ -116,86 +126,155 @@ class TestStoreMessage:
             content="updated",
             timestamp="2024-01-01T00:00:01.000Z",
         )
-        messages = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z", "BotName")
+        messages = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z")
         assert len(messages) == 1
         assert messages[0].content == "updated"
 
 
+class TestStoreMessages:
+    def test_stores_batch_in_order(self):
+        store_chats_metadata([("-1001234567890", "2024-01-01T00:00:00.000Z")])
+        store_messages([
+            NewMessage(
+                id=f"m{i}",
+                chat_id="-1001234567890",
+                sender="user-123",
+                sender_name="Alice",
+                content=f"msg {i}",
+                timestamp=f"2024-01-01T00:00:0{i}.000Z",
+            )
+            for i in range(1, 4)
+        ])
+        messages = get_messages_since("-1001234567890", "")
+        assert [m.id for m in messages] == ["m1", "m2", "m3"]
+
+    def test_empty_batch_is_noop(self):
+        store_messages([])
+        store_chats_metadata([])
+        assert get_all_chats() == []
+
+    def test_chats_metadata_keeps_latest_time(self):
+        store_chats_metadata([
+            ("-100111111", "2024-01-01T00:00:05.000Z"),
+            ("-100111111", "2024-01-01T00:00:01.000Z"),
+        ])
+        chats = get_all_chats()
+        assert len(chats) == 1
+        assert chats[0].last_message_time == "2024-01-01T00:00:05.000Z"
+
+
 # ── getMessagesSince ──────────────────────────────────────────
 
 
+# (id, content, timestamp, sender)
+_SINCE_SEED = (
+    ("m1", "first", "2024-01-01T00:00:01.000Z", "Alice"),
+    ("m2", "second", "2024-01-01T00:00:02.000Z", "Bob"),
+    ("m3", "Andy: bot reply", "2024-01-01T00:00:03.000Z", "Bot"),
+    ("m4", "third", "2024-01-01T00:00:04.000Z", "Carol"),
+)
+
+
 class TestGetMessagesSince:
     @pytest.fixture(autouse=True)
     def _seed_messages(self):
         store_chat_metadata("-1001234567890", "2024-01-01T00:00:00.000Z")
-        msgs = [
-            {"id": "m1", "content": "first", "ts": "2024-01-01T00:00:01.000Z", "sender": "Alice"},
-            {"id": "m2", "content": "second", "ts": "2024-01-01T00:00:02.000Z", "sender": "Bob"},
-            {"id": "m3", "content": "Andy: bot reply", "ts": "2024-01-01T00:00:03.000Z", "sender": "Bot"},
-            {"id": "m4", "content": "third", "ts": "2024-01-01T00:00:04.000Z", "sender": "Carol"},
-        ]
-        for m in msgs:
-            store(
-                id=m["id"],
+        store_messages([
+            NewMessage(
+                id=mid,
                 chat_id="-1001234567890",
-                sender=f"user-{m['sender'].lower()}",
-                sender_name=m["sender"],
-                content=m["content"],
-                timestamp=m["ts"],
+                sender=f"user-{sender.lower()}",
+                sender_name=sender,
+                content=content,
+                timestamp=ts,
             )
+            for mid, content, ts, sender in _SINCE_SEED
+        ])
 
     def test_returns_messages_after_timestamp(self):
-        msgs = get_messages_since("-1001234567890", "2024-01-01T00:00:02.000Z", "Andy")
-        # msg m3 "Andy: bot reply" is excluded by bot_prefix filter, so only m4 "third"
+        msgs = get_messages_since("-1001234567890", "2024-01-01T00:00:02.000Z")
+        # msg m3 "Andy: bot reply" is flagged is_bot, so only m4 "third"
         assert len(msgs) == 1
         assert msgs[0].content == "third"
 
     def test_excludes_assistant_messages(self):
-        msgs = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z", "Andy")
+        msgs = get_messages_since("-1001234567890", "2024-01-01T00:00:00.000Z")
         bot_msgs = [m for m in msgs if m.content.startswith("Andy:")]
         assert len(bot_msgs) == 0
 
     def test_returns_all_when_timestamp_empty(self):
-        msgs = get_messages_since("-1001234567890", "", "Andy")
+        msgs = get_messages_since("-1001234567890", "")
         assert len(msgs) == 3  # 3 user messages (bot message excluded)
 
+    def test_flags_bot_messages_at_insert(self):
+        rows = _get_db().execute(
+            "SELECT id, is_bot FROM messages ORDER BY id"
+        ).fetchall()
+        assert [tuple(r) for r in rows] == [("m1", 0), ("m2", 0), ("m3", 1), ("m4", 0)]
+
+    def test_nonbot_query_uses_partial_index(self):
+        plan = _get_db().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM messages "
+            "WHERE is_bot = 0 AND chat_id = ? AND timestamp > ? ORDER BY timestamp",
+            ("-1001234567890", ""),
+        ).fetchall()
+        details = " ".join(row[3] for row in plan)
+        assert "idx_messages_nonbot" in details
+        assert "TEMP B-TREE" not in details
+
+    def test_messages_carry_one_chat_index(self):
+        indexes = {
+            row[1] for row in _get_db().execute("PRAGMA index_list(messages)")
+            if not row[1].startswith("sqlite_autoindex")
+        }
+        assert indexes == {"idx_messages_nonbot"}
+
 
 # ── getNewMessages ────────────────────────────────────────────
 
 
+# (id, chat_id, content, timestamp)
+_MULTI_GROUP_SEED = (
+    ("a1", "-100111111", "g1 msg1", "2024-01-01T00:00:01.000Z"),
+    ("a2", "-100222222", "g2 msg1", "2024-01-01T00:00:02.000Z"),
+    ("a3", "-100111111", "Andy: reply", "2024-01-01T00:00:03.000Z"),
+    ("a4", "-100111111", "g1 msg2", "2024-01-01T00:00:04.000Z"),
+)
+
+
 class TestGetNewMessages:
     @pytest.fixture(autouse=True)
     def _seed_multi_group(self):
-        store_chat_metadata("-100111111", "2024-01-01T00:00:00.000Z")
-        store_chat_metadata("-100222222", "2024-01-01T00:00:00.000Z")
-        msgs = [
-            {"id": "a1", "chat": "-100111111", "content": "g1 msg1", "ts": "2024-01-01T00:00:01.000Z"},
-            {"id": "a2", "chat": "-100222222", "content": "g2 msg1", "ts": "2024-01-01T00:00:02.000Z"},
-            {"id": "a3", "chat": "-100111111", "content": "Andy: reply", "ts": "2024-01-01T00:00:03.000Z"},
-            {"id": "a4", "chat": "-100111111", "content": "g1 msg2", "ts": "2024-01-01T00:00:04.000Z"},
-        ]
-        for m in msgs:
-            store(
-                id=m["id"],
-                chat_id=m["chat"],
+        store_chats_metadata([
+            ("-100111111", "2024-01-01T00:00:00.000Z"),
+            ("-100222222", "2024-01-01T00:00:00.000Z"),
+        ])
+        store_messages([
+            NewMessage(
+                id=mid,
+                chat_id=chat_id,
                 sender="user-1",
                 sender_name="User",
-                content=m["content"],
-                timestamp=m["ts"],
+                content=content,
+                timestamp=ts,
             )
+            for mid, chat_id, content, ts in _MULTI_GROUP_SEED
+        ])
 
     def test_returns_messages_across_groups(self):
-        messages, new_ts = get_new_messages(["-100111111", "-100222222"], "2024-01-01T00:00:00.000Z", "Andy")
+        messages, new_ts = get_new_messages(
+            ["-100111111", "-100222222"], "2024-01-01T00:00:00.000Z"
+        )
         assert len(messages) == 3
         assert new_ts == "2024-01-01T00:00:04.000Z"
 
     def test_filters_by_timestamp(self):
-        messages, _ts = get_new_messages(["-100111111", "-100222222"], "2024-01-01T00:00:02.000Z", "Andy")
+        messages, _ts = get_new_messages(["-100111111", "-100222222"], "2024-01-01T00:00:02.000Z")
         assert len(messages) == 1
         assert messages[0].content == "g1 msg2"
 
     def test_empty_for_no_groups(self):
-        messages, new_ts = get_new_messages([], "", "Andy")
+        messages, new_ts = get_new_messages([], "")
         assert len(messages) == 0
         assert new_ts == ""
 
@@ -283,3 +362,94 @@ class TestTaskCRUD:
         ))
         delete_task("task-3")
         assert get_task_by_id("task-3") is None
+
+    def test_finish_task_run_updates_and_logs(self):
+        create_task(ScheduledTask(
+            id="task-4",
+            group_folder="main",
+            chat_id="-1001234567890",
+            prompt="run once",
+            schedule_type="once",
+            schedule_value="2024-06-01T00:00:00.000Z",
+            context_mode="isolated",
+            next_run="2024-06-01T00:00:00.000Z",
+            status="active",
+            created_at="2024-01-01T00:00:00.000Z",
+        ))
+        finish_task_run("task-4", None, "done", TaskRunLog(
+            id="",
+            task_id="task-4",
+            started_at="2024-06-01T00:00:01.000Z",
+            status="success",
+        ))
+        task = get_task_by_id("task-4")
+        assert task.status == "completed"
+        assert task.last_run == "2024-06-01T00:00:01.000Z"
+        logs = _get_db().execute(
+            "SELECT status FROM task_run_logs WHERE task_id = ?", ("task-4",)
+        ).fetchall()
+        assert [row["status"] for row in logs] == ["success"]
+
+    def test_next_run_after_skips_past_and_inactive(self):
+        create_tasks([
+            ScheduledTask(
+                id=id,
+                group_folder="main",
+                chat_id="-1001234567890",
+                prompt="p",
+                schedule_type="once",
+                schedule_value=next_run,
+                context_mode="isolated",
+                next_run=next_run,
+                status=status,
+                created_at="2024-01-01T00:00:00.000Z",
+            )
+            for id, next_run, status in (
+                ("t-past", "2024-01-01T00:00:00+00:00", "active"),
+                ("t-paused", "2024-03-01T00:00:00+00:00", "paused"),
+                ("t-late", "2024-05-01T00:00:00+00:00", "active"),
+                ("t-soon", "2024-04-01T00:00:00+00:00", "active"),
+            )
+        ])
+        assert get_next_run_after("2024-02-01T00:00:00+00:00") == "2024-04-01T00:00:00+00:00"
+        assert get_next_run_after("2024-06-01T00:00:00+00:00") is None
+
+    def test_task_snapshot_cached_until_task_write(self):
+        create_task(ScheduledTask(
+            id="task-5",
+            group_folder="main",
+            chat_id="-1001234567890",
+            prompt="snap",
+            schedule_type="once",
+            schedule_value="2024-06-01T00:00:00.000Z",
+            context_mode="isolated",
+            next_run="2024-06-01T00:00:00.000Z",
+            status="active",
+            created_at="2024-01-01T00:00:00.000Z",
+        ))
+        first = get_task_snapshot()
+        assert [(t["id"], t["groupFolder"], t["status"]) for t in first] == [
+            ("task-5", "main", "active")
+        ]
+        assert get_task_snapshot() is first
+
+        update_task("task-5", status="paused")
+        assert get_task_snapshot()[0]["status"] == "paused"
+
+        delete_task("task-5")
+        assert get_task_snapshot() == []
+
+
+# ── Router state ──────────────────────────────────────────────
+
+
+class TestRouterState:
+    def test_sets_many_keys(self):
+        set_router_states({"last_timestamp": "t1", "last_agent_timestamp": "{}"})
+        assert get_router_state("last_timestamp") == "t1"
+        assert get_router_state("last_agent_timestamp") == "{}"
+
+    def test_overwrites_existing_key(self):
+        set_router_state("last_timestamp", "t1")
+        set_router_states({"last_timestamp": "t2"})
+        assert get_router_state("last_timestamp") == "t2"
@@ -9,21 +9,21 @@ from __future__ import annotations
 import pytest
 
 from nanoclaw.config import ASSISTANT_NAME, TRIGGER_PATTERN
-from nanoclaw.router import escape_xml, format_messages, format_outbound
+from nanoclaw.router import escape_xml, format_messages, format_outbound, has_trigger
 from nanoclaw.types import NewMessage
 
+_MSG_DEFAULTS = {
+    "id": "1",
+    "chat_id": "-1001234567890",
+    "sender": "user-123",
+    "sender_name": "Alice",
+    "content": "hello",
+    "timestamp": "2024-01-01T00:00:00.000Z",
+}
+
 
 def make_msg(**overrides) -> NewMessage:
-    defaults = {
-        "id": "1",
-        "chat_id": "-1001234567890",
-        "sender": "user-123",
-        "sender_name": "Alice",
-        "content": "hello",
-        "timestamp": "2024-01-01T00:00:00.000Z",
-    }
-    defaults.update(overrides)
-    return NewMessage(**defaults)
+    return NewMessage(**{**_MSG_DEFAULTS, **overrides})
 
 
 # ── escapeXml ─────────────────────────────────────────────────
@@ -109,6 +109,36 @@ class TestTriggerPattern:
         assert TRIGGER_PATTERN.search("@Andy")
 
 
+class TestHasTrigger:
+    def test_matches_any_message_in_batch(self):
+        msgs = [make_msg(content="hello"), make_msg(content="@Andy do it")]
+        assert has_trigger(msgs)
+
+    def test_ignores_leading_whitespace(self):
+        assert has_trigger([make_msg(content="  \n@Andy hi")])
+
+    def test_no_match_on_later_line(self):
+        assert not has_trigger([make_msg(content="hello\n@Andy")])
+
+    def test_no_match_mid_message(self):
+        msgs = [make_msg(content="hello @Andy"), make_msg(content="@Andrew hi")]
+        assert not has_trigger(msgs)
+
+    def test_empty_batch(self):
+        assert not has_trigger([])
+
+    def test_no_match_on_underscore_continuation(self):
+        assert not has_trigger([make_msg(content="@Andy_bot hi")])
+
+    def test_agrees_with_trigger_pattern(self):
+        for content in (
+            "@Andy", "@andy!", "@ANDY's", " @Andy x", "@Andy1", "@Andyé",
+            "@And", "", "Andy", "\t@andy\n", "@Andy-bot", "x@Andy",
+        ):
+            expected = bool(TRIGGER_PATTERN.search(content.strip()))
+            assert has_trigger([make_msg(content=content)]) == expected, content
+
+
 # ── formatOutbound ────────────────────────────────────────────
 
 
@@ -136,7 +166,7 @@ class TestTriggerGating:
     def _should_process(self, is_main: bool, requires_trigger: bool | None, messages: list[NewMessage]) -> bool:
         if not self._should_require_trigger(is_main, requires_trigger):
             return True
-        return any(TRIGGER_PATTERN.search(m.content.strip()) for m in messages)
+        return has_trigger(messages)
 
     def test_main_always_processes(self):
         msgs = [make_msg(content="hello no trigger")]
@@ -7,6 +7,8 @@ shutdown, and draining.  All JID → chat_id.
 from __future__ import annotations
 
 import asyncio
+import json
+import time
 from unittest.mock import patch
 
 import pytest
@@ -16,9 +18,8 @@ from nanoclaw.group_queue import GroupQueue
 
 
 @pytest.fixture
-def queue(monkeypatch):
-    monkeypatch.setattr(gq_mod, "MAX_CONCURRENT_CONTAINERS", 2)
-    q = GroupQueue()
+def queue():
+    q = GroupQueue(max_concurrent=2)
     yield q
 
 
@@ -28,29 +29,41 @@ class TestGroupQueue:
         """Only one container per group at a time."""
         concurrent_count = 0
         max_concurrent = 0
+        calls = 0
+        started = asyncio.Event()
+        release = asyncio.Event()
+        second_done = asyncio.Event()
 
         async def process(chat_id: str) -> bool:
-            nonlocal concurrent_count, max_concurrent
+            nonlocal concurrent_count, max_concurrent, calls
+            calls += 1
             concurrent_count += 1
             max_concurrent = max(max_concurrent, concurrent_count)
-            await asyncio.sleep(0.05)
+            started.set()
+            await release.wait()
             concurrent_count -= 1
+            if calls == 2:
+                second_done.set()
             return True
 
         queue.set_process_messages_fn(process)
         queue.enqueue_message_check("-100group1")
-        await asyncio.sleep(0)  # let first task start (sets active=True)
+        await asyncio.wait_for(started.wait(), timeout=1)
         queue.enqueue_message_check("-100group1")
 
-        await asyncio.sleep(0.2)
+        release.set()
+        await asyncio.wait_for(second_done.wait(), timeout=1)
         assert max_concurrent == 1
 
     @pytest.mark.asyncio
     async def test_respects_global_concurrency_limit(self, queue: GroupQueue):
-        """Respects MAX_CONCURRENT_CONTAINERS (mocked to 2)."""
+        """Respects the concurrency limit (2 in these tests)."""
         active_count = 0
         max_active = 0
         events: list[asyncio.Event] = []
+        started: dict[str, asyncio.Event] = {
+            f"-100group{i}": asyncio.Event() for i in range(1, 4)
+        }
 
         async def process(chat_id: str) -> bool:
             nonlocal active_count, max_active
@@ -58,6 +71,7 @@ class TestGroupQueue:
             max_active = max(max_active, active_count)
             ev = asyncio.Event()
             events.append(ev)
+            started[chat_id].set()
             await ev.wait()
             active_count -= 1
             return True
@@ -66,25 +80,30 @@ class TestGroupQueue:
 
         queue.enqueue_message_check("-100group1")
         queue.enqueue_message_check("-100group2")
-        await asyncio.sleep(0)  # let first two start
+        await asyncio.wait_for(started["-100group2"].wait(), timeout=1)
         queue.enqueue_message_check("-100group3")
 
-        await asyncio.sleep(0.05)
+        await asyncio.sleep(0)
+        assert not started["-100group3"].is_set()
         assert max_active == 2
         assert active_count == 2
 
         # Free a slot
         events[0].set()
-        await asyncio.sleep(0.05)
+        await asyncio.wait_for(started["-100group3"].wait(), timeout=1)
 
-        # Third should be active now
+        # Third is active now, still within the limit
         assert max_active == 2
+        for ev in events:
+            ev.set()
 
     @pytest.mark.asyncio
     async def test_tasks_before_messages(self, queue: GroupQueue):
         """Tasks are drained before message checks."""
         order: list[str] = []
+        started = asyncio.Event()
         block_first = asyncio.Event()
+        second_done = asyncio.Event()
 
         call_count = 0
 
@@ -92,13 +111,16 @@ class TestGroupQueue:
             nonlocal call_count
             call_count += 1
             if call_count == 1:
+                started.set()
                 await block_first.wait()
             order.append("messages")
+            if call_count == 2:
+                second_done.set()
             return True
 
         queue.set_process_messages_fn(process)
         queue.enqueue_message_check("-100group1")
-        await asyncio.sleep(0.01)
+        await asyncio.wait_for(started.wait(), timeout=1)
 
         # While first process is active, enqueue task + message
         async def task_fn():
@@ -108,7 +130,7 @@ class TestGroupQueue:
         queue.enqueue_message_check("-100group1")
 
         block_first.set()
-        await asyncio.sleep(0.1)
+        await asyncio.wait_for(second_done.wait(), timeout=1)
 
         assert order[0] == "messages"  # first call
         assert order[1] == "task"  # task runs before second message check
@@ -124,6 +146,7 @@ class TestGroupQueue:
             return False
 
         monkeypatch.setattr(gq_mod, "BASE_RETRY_SECONDS", 0.05)
+        monkeypatch.setattr(gq_mod._rng, "uniform", lambda low, high: high)
         queue.set_process_messages_fn(process)
         queue.enqueue_message_check("-100group1")
 
@@ -148,19 +171,24 @@ class TestGroupQueue:
         await queue.shutdown(100)
 
         queue.enqueue_message_check("-100group1")
-        await asyncio.sleep(0.05)
+        await asyncio.sleep(0)
         assert call_count == 0
+        assert not queue._get_group("-100group1").active
 
     @pytest.mark.asyncio
     async def test_drains_waiting_groups(self, queue: GroupQueue):
         """Waiting groups are drained when slots free up."""
         processed: list[str] = []
         events: list[asyncio.Event] = []
+        started: dict[str, asyncio.Event] = {
+            f"-100group{i}": asyncio.Event() for i in range(1, 4)
+        }
 
         async def process(chat_id: str) -> bool:
             processed.append(chat_id)
             ev = asyncio.Event()
             events.append(ev)
+            started[chat_id].set()
             await ev.wait()
             return True
 
@@ -168,12 +196,199 @@ class TestGroupQueue:
 
         queue.enqueue_message_check("-100group1")
         queue.enqueue_message_check("-100group2")
-        await asyncio.sleep(0.05)
+        await asyncio.wait_for(started["-100group2"].wait(), timeout=1)
 
         queue.enqueue_message_check("-100group3")
-        await asyncio.sleep(0.05)
+        await asyncio.sleep(0)
         assert processed == ["-100group1", "-100group2"]
 
         events[0].set()
-        await asyncio.sleep(0.05)
+        await asyncio.wait_for(started["-100group3"].wait(), timeout=1)
         assert "-100group3" in processed
+        for ev in events:
+            ev.set()
+
+    @pytest.mark.asyncio
+    async def test_duplicate_pending_task_is_skipped(self, queue: GroupQueue):
+        """A task id already pending is not queued twice."""
+        block = asyncio.Event()
+        runs: list[str] = []
+
+        async def process(chat_id: str) -> bool:
+            await block.wait()
+            return True
+
+        async def task_fn():
+            runs.append("task-1")
+
+        queue.set_process_messages_fn(process)
+        queue.enqueue_message_check("-100group1")
+        await asyncio.sleep(0)
+
+        queue.enqueue_task("-100group1", "task-1", task_fn)
+        queue.enqueue_task("-100group1", "task-1", task_fn)
+
+        block.set()
+        await asyncio.sleep(0.05)
+        assert runs == ["task-1"]
+
+    @pytest.mark.asyncio
+    async def test_send_message_writes_ipc_file(self, queue: GroupQueue, monkeypatch, tmp_path):
+        """Follow-up messages land as JSON files in the active group's input dir."""
+        monkeypatch.setattr(gq_mod, "DATA_DIR", tmp_path)
+        assert await queue.send_message("-100group1", "hi") is False
+
+        state = queue._get_group("-100group1")
+        state.active = True
+        state.group_folder = "group1"
+        assert await queue.send_message("-100group1", "hi") is True
+
+        files = list((tmp_path / "ipc" / "group1" / "input").glob("*.json"))
+        assert len(files) == 1
+        assert json.loads(files[0].read_text()) == {"type": "message", "text": "hi"}
+
+    @pytest.mark.asyncio
+    async def test_close_sentinel_never_overtakes_pending_message(
+        self, queue: GroupQueue, monkeypatch
+    ):
+        """close_stdin issued after send_message is written after the message."""
+        writes: list[str] = []
+
+        def slow_message(input_dir, text):
+            time.sleep(0.02)
+            writes.append(text)
+            return True
+
+        monkeypatch.setattr(gq_mod, "_write_ipc_message", slow_message)
+        monkeypatch.setattr(gq_mod, "_write_close_sentinel", lambda d: writes.append("_close"))
+        state = queue._get_group("-100group1")
+        state.active = True
+        state.group_folder = "group1"
+
+        send = asyncio.create_task(queue.send_message("-100group1", "hi"))
+        await asyncio.sleep(0)  # the message write is now in flight
+        queue.close_stdin("-100group1")
+        assert await send is True
+        await asyncio.get_running_loop().run_in_executor(gq_mod._ipc_writer, lambda: None)
+        assert writes == ["hi", "_close"]
+
+    @pytest.mark.asyncio
+    async def test_retry_delay_is_jittered_and_capped(self, queue: GroupQueue, monkeypatch):
+        """Retry delays are drawn from the upper half of the capped backoff."""
+        bounds: list[tuple[float, float]] = []
+
+        def fake_uniform(low: float, high: float) -> float:
+            bounds.append((low, high))
+            return 3600.0  # never fires during the test
+
+        monkeypatch.setattr(gq_mod, "MAX_RETRY_DELAY_SECONDS", 12.0)
+        monkeypatch.setattr(gq_mod._rng, "uniform", fake_uniform)
+        state = queue._get_group("-100group1")
+        for _ in range(4):
+            queue._schedule_retry("-100group1", state)
+
+        assert bounds == [(2.5, 5.0), (5.0, 10.0), (6.0, 12.0), (6.0, 12.0)]
+        await queue.shutdown(0)
+
+    @pytest.mark.asyncio
+    async def test_waiting_groups_share_slots_by_weight(self, queue: GroupQueue, monkeypatch):
+        """Waiting groups are dispatched by weighted fair queueing."""
+        monkeypatch.setattr(gq_mod, "GROUP_WEIGHTS", {"-100heavy": 2.0})
+        started: list[str] = []
+
+        def fake_run(chat_id: str, reason: str):
+            started.append(chat_id)
+            return asyncio.sleep(0)
+
+        monkeypatch.setattr(queue, "_run_for_group", fake_run)
+        for _ in range(6):
+            # Both groups always have work; exactly one slot frees per round
+            for chat_id in ("-100heavy", "-100light"):
+                state = queue._get_group(chat_id)
+                state.active = False
+                state.pending_messages = True
+                queue._add_waiting(chat_id, state)
+            queue._active_count = queue._max_concurrent - 1
+            queue._drain_waiting()
+
+        assert started == [
+            "-100heavy", "-100light", "-100heavy", "-100light", "-100heavy", "-100heavy",
+        ]
+        await asyncio.sleep(0)
+
+    @pytest.mark.asyncio
+    async def test_busy_group_yields_freed_slot_to_waiting_group(self, queue: GroupQueue):
+        """A finishing group with more work queues behind groups already waiting."""
+        events: dict[str, asyncio.Event] = {}
+        started: list[str] = []
+
+        async def process(chat_id: str) -> bool:
+            started.append(chat_id)
+            events[chat_id] = asyncio.Event()
+            await events[chat_id].wait()
+            return True
+
+        queue.set_process_messages_fn(process)
+        queue.enqueue_message_check("-100group1")
+        queue.enqueue_message_check("-100group2")
+        await asyncio.sleep(0)
+        queue.enqueue_message_check("-100group3")  # waits for a slot
+        queue.enqueue_message_check("-100group1")  # more work while active
+
+        events["-100group1"].set()
+        await asyncio.sleep(0.01)
+        assert started == ["-100group1", "-100group2", "-100group3"]
+
+        events["-100group2"].set()
+        await asyncio.sleep(0.01)
+        assert started[-1] == "-100group1"
+
+        for ev in events.values():
+            ev.set()
+        await asyncio.sleep(0.01)
+
+    @pytest.mark.asyncio
+    async def test_drain_does_not_exceed_concurrency_limit(self, queue: GroupQueue):
+        """Freeing one slot starts only one waiting group."""
+        events: dict[str, asyncio.Event] = {}
+        running: list[str] = []
+
+        async def process(chat_id: str) -> bool:
+            running.append(chat_id)
+            events[chat_id] = asyncio.Event()
+            await events[chat_id].wait()
+            running.remove(chat_id)
+            return True
+
+        queue.set_process_messages_fn(process)
+        for i in range(1, 6):
+            queue.enqueue_message_check(f"-100group{i}")
+        await asyncio.sleep(0.01)
+        assert running == ["-100group1", "-100group2"]
+
+        events["-100group1"].set()
+        await asyncio.sleep(0.01)
+        assert running == ["-100group2", "-100group3"]
+
+        for ev in events.values():
+            ev.set()
+        await asyncio.sleep(0.05)
+
+    @pytest.mark.asyncio
+    async def test_back_to_back_enqueues_start_one_container(self, queue: GroupQueue):
+        """Two immediate enqueues for a group run one container, then a drain."""
+        calls = 0
+
+        async def process(chat_id: str) -> bool:
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return True
+
+        queue.set_process_messages_fn(process)
+        queue.enqueue_message_check("-100group1")
+        queue.enqueue_message_check("-100group1")
+        await asyncio.sleep(0)
+        assert calls == 1
+        await asyncio.sleep(0.05)
+        assert calls == 2
@@ -6,20 +6,28 @@ message authorization logic.  All JID → chat_id.
 
 from __future__ import annotations
 
+from datetime import datetime, timedelta, timezone
+
 import pytest
 
 from nanoclaw.db import (
     _init_test_database,
     create_task,
+    create_tasks,
     get_all_tasks,
     get_registered_group,
     get_task_by_id,
     set_registered_group,
+    set_registered_groups,
+)
+from nanoclaw.ipc import (
+    _next_run_cron,
+    _next_run_interval,
+    _process_ipc_files,
+    process_task_ipc,
 )
-from nanoclaw.ipc import process_task_ipc
 from nanoclaw.types import RegisteredGroup, ScheduledTask
 
-
 MAIN_GROUP = RegisteredGroup(
     name="Main", folder="main", trigger="always", added_at="2024-01-01T00:00:00.000Z"
 )
@@ -30,38 +38,36 @@ THIRD_GROUP = RegisteredGroup(
     name="Third", folder="third-group", trigger="@Andy", added_at="2024-01-01T00:00:00.000Z"
 )
 
+# Shared read-only; _deps() copies it because register_group mutates
+_GROUPS: dict[str, RegisteredGroup] = {
+    "-100main": MAIN_GROUP,
+    "-100other": OTHER_GROUP,
+    "-100third": THIRD_GROUP,
+}
+
+
+_TASK_DEFAULTS = dict(
+    id="task-1",
+    group_folder="main",
+    chat_id="-100main",
+    prompt="test",
+    schedule_type="once",
+    schedule_value="2025-06-01T00:00:00.000Z",
+    context_mode="isolated",
+    next_run="2025-06-01T00:00:00.000Z",
+    status="active",
+    created_at="2024-01-01T00:00:00.000Z",
+)
+
 
 def _make_task(**overrides) -> ScheduledTask:
-    defaults = dict(
-        id="task-1",
-        group_folder="main",
-        chat_id="-100main",
-        prompt="test",
-        schedule_type="once",
-        schedule_value="2025-06-01T00:00:00.000Z",
-        context_mode="isolated",
-        next_run="2025-06-01T00:00:00.000Z",
-        status="active",
-        created_at="2024-01-01T00:00:00.000Z",
-    )
-    defaults.update(overrides)
-    return ScheduledTask(**defaults)
+    return ScheduledTask(**{**_TASK_DEFAULTS, **overrides})
 
 
 @pytest.fixture(autouse=True)
 def _setup():
     _init_test_database()
-    set_registered_group("-100main", MAIN_GROUP)
-    set_registered_group("-100other", OTHER_GROUP)
-    set_registered_group("-100third", THIRD_GROUP)
-
-
-def _groups():
-    return {
-        "-100main": MAIN_GROUP,
-        "-100other": OTHER_GROUP,
-        "-100third": THIRD_GROUP,
-    }
+    set_registered_groups(_GROUPS)
 
 
 class _FakeDeps:
@@ -91,7 +97,7 @@ class _FakeDeps:
 
 
 def _deps():
-    return _FakeDeps(_groups())
+    return _FakeDeps(_GROUPS.copy())
 
 
 # ── schedule_task authorization ───────────────────────────────
@@ -138,6 +144,15 @@ class TestScheduleTaskAuth:
         )
         assert len(get_all_tasks()) == 0
 
+    @pytest.mark.asyncio
+    async def test_rejects_missing_prompt(self):
+        await process_task_ipc(
+            {"type": "schedule_task", "schedule_type": "once",
+             "schedule_value": "2025-06-01T00:00:00.000Z", "targetChatId": "-100main"},
+            "main", True, _deps(),
+        )
+        assert len(get_all_tasks()) == 0
+
 
 # ── pause_task authorization ─────────────────────────────────
 
@@ -145,8 +160,15 @@ class TestScheduleTaskAuth:
 class TestPauseTaskAuth:
     @pytest.fixture(autouse=True)
     def _seed_tasks(self):
-        create_task(_make_task(id="task-main", group_folder="main", chat_id="-100main", prompt="main task"))
-        create_task(_make_task(id="task-other", group_folder="other-group", chat_id="-100other", prompt="other task"))
+        create_tasks([
+            _make_task(id="task-main", group_folder="main", chat_id="-100main", prompt="main task"),
+            _make_task(
+                id="task-other",
+                group_folder="other-group",
+                chat_id="-100other",
+                prompt="other task",
+            ),
+        ])
 
     @pytest.mark.asyncio
     async def test_main_can_pause_any(self):
@@ -270,6 +292,10 @@ class TestRegisterGroupAuth:
 
 
 class TestIpcMessageAuth:
+    @pytest.fixture
+    def _setup(self):
+        """Override the module fixture: these checks never touch the database."""
+
     def _is_authorized(
         self, source_group: str, is_main: bool, target_chat_id: str,
         registered: dict[str, RegisteredGroup],
@@ -278,23 +304,21 @@ class TestIpcMessageAuth:
         return is_main or (target is not None and target.folder == source_group)
 
     def test_main_can_send_anywhere(self):
-        groups = _groups()
-        assert self._is_authorized("main", True, "-100other", groups)
-        assert self._is_authorized("main", True, "-100third", groups)
+        assert self._is_authorized("main", True, "-100other", _GROUPS)
+        assert self._is_authorized("main", True, "-100third", _GROUPS)
 
     def test_non_main_can_send_to_own(self):
-        assert self._is_authorized("other-group", False, "-100other", _groups())
+        assert self._is_authorized("other-group", False, "-100other", _GROUPS)
 
     def test_non_main_cannot_send_to_other(self):
-        groups = _groups()
-        assert not self._is_authorized("other-group", False, "-100main", groups)
-        assert not self._is_authorized("other-group", False, "-100third", groups)
+        assert not self._is_authorized("other-group", False, "-100main", _GROUPS)
+        assert not self._is_authorized("other-group", False, "-100third", _GROUPS)
 
     def test_non_main_cannot_send_to_unregistered(self):
-        assert not self._is_authorized("other-group", False, "-100unknown", _groups())
+        assert not self._is_authorized("other-group", False, "-100unknown", _GROUPS)
 
     def test_main_can_send_to_unregistered(self):
-        assert self._is_authorized("main", True, "-100unknown", _groups())
+        assert self._is_authorized("main", True, "-100unknown", _GROUPS)
 
 
 # ── schedule_task schedule types ──────────────────────────────
@@ -362,6 +386,22 @@ class TestScheduleTypes:
         )
         assert len(get_all_tasks()) == 0
 
+    def test_next_run_from_fixed_clock(self):
+        # The helpers take "now" explicitly, so no clock needs patching
+        now = datetime(2025, 5, 31, tzinfo=timezone.utc)
+        assert _next_run_interval("3600000", now) == "2025-05-31T01:00:00+00:00"
+        cron_next = datetime.fromisoformat(_next_run_cron("0 9 * * *", now))
+        assert now < cron_next <= now + timedelta(days=1)
+
+    @pytest.mark.asyncio
+    async def test_rejects_unknown_schedule_type(self):
+        await process_task_ipc(
+            {"type": "schedule_task", "prompt": "bad type", "schedule_type": "weekly",
+             "schedule_value": "monday", "targetChatId": "-100other"},
+            "main", True, _deps(),
+        )
+        assert len(get_all_tasks()) == 0
+
 
 # ── context_mode ──────────────────────────────────────────────
 
@@ -409,3 +449,40 @@ class TestContextMode:
         )
         tasks = get_all_tasks()
         assert tasks[0].context_mode == "isolated"
+
+
+# ── IPC file processing ───────────────────────────────────────
+
+
+class TestIpcFileProcessing:
+    @pytest.mark.asyncio
+    async def test_handled_files_deleted_and_bad_files_moved(self, tmp_path):
+        messages = tmp_path / "other-group" / "messages"
+        messages.mkdir(parents=True)
+        (messages / "1-ok.json").write_text(
+            '{"type": "message", "chatId": "-100other", "text": "hi"}'
+        )
+        (messages / "2-bad.json").write_text("{not json")
+
+        await _process_ipc_files(tmp_path, _deps())
+
+        assert list(messages.iterdir()) == []
+        assert (tmp_path / "errors" / "other-group-2-bad.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_file_deleted_before_next_send(self, tmp_path):
+        messages = tmp_path / "other-group" / "messages"
+        messages.mkdir(parents=True)
+        for i in (1, 2):
+            (messages / f"{i}.json").write_text(
+                f'{{"type": "message", "chatId": "-100other", "text": "m{i}"}}'
+            )
+        seen: list[list[str]] = []
+
+        class _RecordingDeps(_FakeDeps):
+            async def send_message(self, chat_id: str, text: str) -> None:
+                seen.append(sorted(p.name for p in messages.iterdir()))
+
+        await _process_ipc_files(tmp_path, _RecordingDeps(_GROUPS.copy()))
+        # A crash during the second send would not replay the first message
+        assert seen == [["1.json", "2.json"], ["2.json"]]
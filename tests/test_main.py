@@ -0,0 +1,128 @@
+"""Tests for the orchestrator's message-driven agent run.
+
+Drives _process_group_messages end to end against the test database, with
+the container runner and snapshot writers stubbed out.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+import nanoclaw.__main__ as main_mod
+from nanoclaw.db import (
+    _init_test_database,
+    create_task,
+    get_messages_since,
+    run_write,
+    store_chats_metadata,
+    store_messages,
+    wait_for_writes,
+)
+from nanoclaw.types import ContainerOutput, NewMessage, RegisteredGroup, ScheduledTask
+
+MAIN_GROUP = RegisteredGroup(
+    name="Main", folder="main", trigger="always", added_at="2024-01-01T00:00:00.000Z"
+)
+
+
+@pytest.fixture
+def agent_env(monkeypatch: pytest.MonkeyPatch):
+    """A registered main group with one pending message; records container calls."""
+    _init_test_database()
+    store_chats_metadata([("-100main", "2024-01-01T00:00:00.000Z")])
+    store_messages([
+        NewMessage(
+            id="m1",
+            chat_id="-100main",
+            sender="user-1",
+            sender_name="Alice",
+            content="hello",
+            timestamp="2024-01-01T00:00:01.000Z",
+        )
+    ])
+    create_task(ScheduledTask(
+        id="task-1",
+        group_folder="main",
+        chat_id="-100main",
+        prompt="p",
+        schedule_type="once",
+        schedule_value="2025-06-01T00:00:00.000Z",
+        context_mode="isolated",
+        next_run="2025-06-01T00:00:00.000Z",
+        status="active",
+        created_at="2024-01-01T00:00:00.000Z",
+    ))
+    monkeypatch.setattr(main_mod, "_registered_groups", {"-100main": MAIN_GROUP})
+    monkeypatch.setattr(main_mod, "_sessions", {})
+    monkeypatch.setattr(main_mod, "_last_agent_timestamp", {})
+
+    calls: dict[str, list] = {"tasks": [], "inputs": []}
+    monkeypatch.setattr(
+        main_mod, "write_tasks_snapshot",
+        lambda folder, is_main, tasks: calls["tasks"].append(tasks),
+    )
+    monkeypatch.setattr(main_mod, "write_groups_snapshot", lambda *args: None)
+    yield calls
+    main_mod._flush_state()
+
+
+class TestProcessGroupMessages:
+    @pytest.mark.asyncio
+    async def test_runs_agent_and_advances_cursor(self, agent_env, monkeypatch):
+        async def fake_run(group, input_data, register_process, on_output):
+            agent_env["inputs"].append(input_data)
+            await on_output(ContainerOutput(status="success", result=None, new_session_id="s1"))
+            return ContainerOutput(status="success", result=None)
+
+        monkeypatch.setattr(main_mod, "run_container_agent", fake_run)
+        assert await main_mod._process_group_messages("-100main") is True
+        await wait_for_writes()
+
+        assert [t["id"] for t in agent_env["tasks"][0]] == ["task-1"]
+        assert ">hello</message>" in agent_env["inputs"][0].prompt
+        assert main_mod._sessions == {"main": "s1"}
+        assert main_mod._last_agent_timestamp["-100main"] == "2024-01-01T00:00:01.000Z"
+
+    @pytest.mark.asyncio
+    async def test_error_rolls_back_cursor(self, agent_env, monkeypatch):
+        async def fake_run(group, input_data, register_process, on_output):
+            return ContainerOutput(status="error", result=None, error="boom")
+
+        monkeypatch.setattr(main_mod, "run_container_agent", fake_run)
+        assert await main_mod._process_group_messages("-100main") is False
+        assert main_mod._last_agent_timestamp["-100main"] == ""
+
+
+class TestFlushIngest:
+    @pytest.mark.asyncio
+    async def test_batch_in_flight_survives_shutdown(self, agent_env, monkeypatch):
+        monkeypatch.setattr(main_mod, "_ingest_queue", asyncio.Queue())
+        # Hold the writer thread so the ingest batch queues behind it
+        release = threading.Event()
+        busy = asyncio.ensure_future(run_write(release.wait))
+        task = asyncio.create_task(main_mod._ingest_writer())
+        monkeypatch.setattr(main_mod, "_ingest_task", task)
+        await main_mod._on_inbound_message("-100main", NewMessage(
+            id="m2",
+            chat_id="-100main",
+            sender="user-1",
+            sender_name="Alice",
+            content="late",
+            timestamp="2024-01-01T00:00:02.000Z",
+        ))
+        await asyncio.sleep(0)
+
+        # Shutdown cancels the writer while its write waits on the busy thread
+        task.cancel()
+        flush = asyncio.create_task(main_mod._flush_ingest())
+        await asyncio.sleep(0)
+        release.set()
+        await flush
+        await busy
+        await wait_for_writes()
+
+        msgs = get_messages_since("-100main", "2024-01-01T00:00:01.000Z")
+        assert [m.id for m in msgs] == ["m2"]
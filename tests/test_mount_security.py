@@ -0,0 +1,169 @@
+"""Tests for mount allowlist validation.
+
+Each test points the module at an allowlist written under tmp_path and
+validates real directories created there.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+import nanoclaw.mount_security as ms
+from nanoclaw.types import AdditionalMount
+
+
+@pytest.fixture
+def roots(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """An allowlist with one read-write root, tmp_path/projects."""
+    projects = tmp_path / "projects"
+    (projects / "app").mkdir(parents=True)
+    allowlist = tmp_path / "mount-allowlist.json"
+    allowlist.write_text(json.dumps({
+        "allowedRoots": [
+            {"path": str(projects), "allowReadWrite": True},
+            {"path": str(tmp_path / "missing")},
+        ],
+        "blockedPatterns": ["password"],
+        "nonMainReadOnly": True,
+    }))
+    monkeypatch.setattr(ms, "MOUNT_ALLOWLIST_PATH", allowlist)
+    ms._reset_cache()
+    yield projects
+    ms._reset_cache()
+
+
+def _validate(path: Path, is_main: bool = True, readonly: bool = True):
+    mount = AdditionalMount(host_path=str(path), readonly=readonly)
+    return ms.validate_mount(mount, is_main)
+
+
+class TestValidateMount:
+    def test_allows_path_under_root(self, roots: Path):
+        result = _validate(roots / "app")
+        assert result.allowed
+        assert result.real_host_path == str(roots / "app")
+        assert result.resolved_container_path == "app"
+
+    def test_rejects_path_outside_roots(self, roots: Path, tmp_path: Path):
+        (tmp_path / "elsewhere").mkdir()
+        result = _validate(tmp_path / "elsewhere")
+        assert not result.allowed
+        assert "not under any allowed root" in result.reason
+
+    def test_rejects_sibling_sharing_root_prefix(self, roots: Path, tmp_path: Path):
+        (tmp_path / "projects-old").mkdir()
+        assert not _validate(tmp_path / "projects-old").allowed
+
+    def test_allows_root_itself(self, roots: Path):
+        assert _validate(roots).allowed
+
+    def test_rejects_missing_path(self, roots: Path):
+        assert not _validate(roots / "nope").allowed
+
+    def test_rejects_default_blocked_pattern(self, roots: Path):
+        (roots / ".ssh").mkdir()
+        result = _validate(roots / ".ssh")
+        assert not result.allowed
+        assert '".ssh"' in result.reason
+
+    def test_rejects_configured_blocked_pattern(self, roots: Path):
+        (roots / "my-password-store").mkdir()
+        assert not _validate(roots / "my-password-store").allowed
+
+    def test_symlink_into_blocked_dir_rejected(self, roots: Path, tmp_path: Path):
+        secret = tmp_path / "projects" / ".aws"
+        secret.mkdir()
+        (roots / "innocent").symlink_to(secret)
+        assert not _validate(roots / "innocent").allowed
+
+    def test_symlinked_parent_outside_root_rejected(self, roots: Path, tmp_path: Path):
+        outside = tmp_path / "outside"
+        (outside / "data").mkdir(parents=True)
+        (roots / "link").symlink_to(outside)
+        result = _validate(roots / "link" / "data")
+        assert not result.allowed
+        assert str(outside / "data") in result.reason
+
+    def test_root_created_after_load_is_seen(self, roots: Path, tmp_path: Path):
+        ms.load_mount_allowlist()
+        (tmp_path / "missing").mkdir()
+        assert _validate(tmp_path / "missing").allowed
+
+    def test_retargeted_root_symlink_is_seen(self, tmp_path: Path, monkeypatch):
+        old, new = tmp_path / "old", tmp_path / "new"
+        old.mkdir()
+        new.mkdir()
+        link = tmp_path / "root-link"
+        link.symlink_to(old)
+        allowlist = tmp_path / "mount-allowlist.json"
+        allowlist.write_text(json.dumps({"allowedRoots": [{"path": str(link)}]}))
+        monkeypatch.setattr(ms, "MOUNT_ALLOWLIST_PATH", allowlist)
+        ms._reset_cache()
+        assert _validate(old).allowed
+
+        link.unlink()
+        link.symlink_to(new)
+        assert not _validate(old).allowed
+        assert _validate(new).allowed
+        ms._reset_cache()
+
+    def test_non_main_forced_read_only(self, roots: Path):
+        assert _validate(roots / "app", is_main=True, readonly=False).effective_readonly is False
+        assert _validate(roots / "app", is_main=False, readonly=False).effective_readonly is True
+
+
+class TestAllowlistReload:
+    def test_reloads_after_edit(self, roots: Path, tmp_path: Path):
+        first = ms.load_mount_allowlist()
+        assert first is not None
+        assert ms.load_mount_allowlist() is first
+
+        ms.MOUNT_ALLOWLIST_PATH.write_text(json.dumps({
+            "allowedRoots": [{"path": str(tmp_path)}],
+            "blockedPatterns": [],
+        }))
+        reloaded = ms.load_mount_allowlist()
+        assert reloaded is not first
+        assert [r.path for r in reloaded.allowed_roots] == [str(tmp_path)]
+
+    def test_picks_up_created_file(self, roots: Path):
+        content = ms.MOUNT_ALLOWLIST_PATH.read_text()
+        ms.MOUNT_ALLOWLIST_PATH.unlink()
+        assert ms.load_mount_allowlist() is None
+
+        ms.MOUNT_ALLOWLIST_PATH.write_text(content)
+        assert ms.load_mount_allowlist() is not None
+
+
+class TestBlockedPatterns:
+    def test_matches_component_and_substring(self):
+        patterns = [".ssh", "id_rsa", "credentials"]
+        assert ms._matches_blocked_pattern("/home/u/.ssh", patterns) == ".ssh"
+        assert ms._matches_blocked_pattern("/home/u/keys/id_rsa.pub", patterns) == "id_rsa"
+        assert ms._matches_blocked_pattern("/srv/app-credentials/x", patterns) == "credentials"
+        assert ms._matches_blocked_pattern("/home/u/projects", patterns) is None
+
+    def test_patterns_are_literal(self):
+        assert ms._matches_blocked_pattern("/home/u/xenv", [".env"]) is None
+        assert ms._matches_blocked_pattern("/home/u/a.env", [".env"]) == ".env"
+
+    def test_no_patterns(self):
+        assert ms._matches_blocked_pattern("/anything", []) is None
+
+
+class TestValidateAdditionalMounts:
+    def test_keeps_only_allowed_mounts(self, roots: Path, tmp_path: Path):
+        (roots / "docs").mkdir()
+        mounts = [
+            AdditionalMount(host_path=str(roots / "app")),
+            AdditionalMount(host_path=str(tmp_path)),
+            AdditionalMount(host_path=str(roots / "docs"), container_path="d"),
+        ]
+        validated = ms.validate_additional_mounts(mounts, "group", is_main=True)
+        assert [(m.host_path, m.container_path) for m in validated] == [
+            (str(roots / "app"), "/workspace/extra/app"),
+            (str(roots / "docs"), "/workspace/extra/d"),
+        ]
@@ -0,0 +1,72 @@
+"""Tests for the task scheduler's run-time checks."""
+
+from __future__ import annotations
+
+import pytest
+
+import nanoclaw.task_scheduler as ts
+from nanoclaw.db import (
+    _init_test_database,
+    create_task,
+    get_task_by_id,
+    update_task_after_run,
+)
+from nanoclaw.types import ScheduledTask
+
+
+class _Deps:
+    """Records whether _run_task got past its due checks."""
+
+    def __init__(self) -> None:
+        self.looked_up_groups = False
+
+    def registered_groups(self):
+        self.looked_up_groups = True
+        return {}
+
+
+def _task(next_run: str | None, status: str = "active") -> ScheduledTask:
+    task = ScheduledTask(
+        id="task-1",
+        group_folder="main",
+        chat_id="-100main",
+        prompt="p",
+        schedule_type="interval",
+        schedule_value="3600000",
+        context_mode="isolated",
+        next_run=next_run,
+        status=status,
+        created_at="2024-01-01T00:00:00.000Z",
+    )
+    create_task(task)
+    return task
+
+
+@pytest.fixture(autouse=True)
+def _setup(tmp_path, monkeypatch):
+    _init_test_database()
+    monkeypatch.setattr(ts, "GROUPS_DIR", tmp_path)
+
+
+class TestRunTaskChecks:
+    @pytest.mark.asyncio
+    async def test_runs_due_task(self):
+        deps = _Deps()
+        await ts._run_task(_task("2024-01-01T00:00:00+00:00"), deps)
+        assert deps.looked_up_groups
+
+    @pytest.mark.asyncio
+    async def test_skips_task_no_longer_due(self):
+        # Queued while due, but a run finished in the meantime moved next_run on
+        queued = _task("2024-01-01T00:00:00+00:00")
+        update_task_after_run("task-1", "2999-01-01T00:00:00+00:00", "ok")
+        deps = _Deps()
+        await ts._run_task(queued, deps)
+        assert not deps.looked_up_groups
+        assert get_task_by_id("task-1").next_run == "2999-01-01T00:00:00+00:00"
+
+    @pytest.mark.asyncio
+    async def test_skips_paused_task(self):
+        deps = _Deps()
+        await ts._run_task(_task("2024-01-01T00:00:00+00:00", status="paused"), deps)
+        assert not deps.looked_up_groups